@@ -0,0 +1,167 @@
+"""
+Memory-mapped columnar archive of sealed days.
+
+Closed days of raw readings are moved out of SQLite (see db.seal_archive)
+into append-only files under `archive_dir`, one fixed-width little-endian
+column per file:
+
+    timestamp.i8                         int64 epoch seconds
+    rapid.f8, fast.f8, standard.f8,      float64 gwei (NaN = tier missing)
+    slow.f8
+    source.u1                            uint8 source id
+
+Rows are in (timestamp, source) order, so a range read is a binary search
+over the mapped timestamp column and the same slice of every other column:
+NumPy views onto the page cache, with nothing copied. `index.json` records
+the first row of each sealed day and how many rows are committed. Bytes
+past that count (an append cut short by a crash) are ignored and
+overwritten by the next append. The files only ever grow, so views handed
+out before an append stay valid.
+"""
+
+import bisect
+import json
+import os
+from collections.abc import Sequence
+
+import numpy as np
+
+from config import settings
+
+DAY = 86400
+
+COLUMNS = {
+    "timestamp": "<i8",
+    "rapid": "<f8",
+    "fast": "<f8",
+    "standard": "<f8",
+    "slow": "<f8",
+    "source": "u1",
+}
+
+Columns = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class ColdArchive:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Covered span [start, end): start may fall inside the first day if
+        # the raw readings before it had already been compacted.
+        self.start = 0
+        self.end = 0
+        self.rows = 0
+        # (day start, first row) per sealed day, oldest first.
+        self._days: list[tuple[int, int]] = []
+        self._columns = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.{np.dtype(COLUMNS[name]).str[1:]}")
+
+    def load(self) -> None:
+        """Read the index and map the committed rows. Cheap if nothing was sealed since."""
+        try:
+            with open(os.path.join(self.path, "index.json")) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        if index["rows"] != self.rows or index["end"] != self.end:
+            self._columns = {
+                name: np.memmap(self._file(name), dtype, mode="r", shape=(index["rows"],))
+                if index["rows"]
+                else np.empty(0, dtype)
+                for name, dtype in COLUMNS.items()
+            }
+        self.start, self.end, self.rows = index["start"], index["end"], index["rows"]
+        self._days = [tuple(d) for d in index["days"]]
+
+    def _bounds(self, from_ts: int, to_ts: int) -> tuple[int, int]:
+        """Row range [i, j) of timestamps in [from_ts, to_ts]."""
+        # The day index narrows each search to a single day's rows, so only
+        # a few pages of the timestamp column are touched.
+        ts = self._columns["timestamp"]
+
+        def search(value: int, side: str) -> int:
+            k = bisect.bisect_right(self._days, (value // DAY * DAY, self.rows))
+            if k == 0:
+                return 0
+            lo = self._days[k - 1][1]
+            hi = self._days[k][1] if k < len(self._days) else self.rows
+            return lo + int(np.searchsorted(ts[lo:hi], value, side))
+
+        return search(from_ts, "left"), search(to_ts, "right")
+
+    def read(self, col: str, from_ts: int, to_ts: int, source: int | None = None) -> Columns:
+        """(timestamps, prices, source ids) of tier `col` in [from_ts, to_ts].
+
+        Views into the mapped files, unless rows have to be filtered out —
+        a tier some sources leave empty, or a single source.
+        """
+        i, j = self._bounds(from_ts, to_ts) if from_ts <= to_ts else (0, 0)
+        ts = self._columns["timestamp"][i:j]
+        price = self._columns[col][i:j]
+        sources = self._columns["source"][i:j]
+        mask = None
+        if col != "standard":
+            mask = ~np.isnan(price)
+        if source is not None:
+            mask = (sources == source) if mask is None else mask & (sources == source)
+        if mask is not None and not mask.all():
+            return ts[mask], price[mask], sources[mask]
+        return ts, price, sources
+
+    def count(self, from_ts: int, to_ts: int) -> int:
+        if from_ts > to_ts:
+            return 0
+        i, j = self._bounds(from_ts, to_ts)
+        return j - i
+
+    def append_day(self, day: int, columns: dict[str, Sequence], start: int | None = None) -> None:
+        """Append one day's rows, in (timestamp, source) order, and commit them.
+
+        Days are appended in order with no gaps (empty days included); the
+        first may begin at `start` rather than midnight. Blocking file I/O —
+        call through asyncio.to_thread.
+        """
+        if self._days and day != self.end:
+            raise ValueError(f"Archive ends at {self.end}; cannot append day {day}")
+        os.makedirs(self.path, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            data = np.asarray(columns[name], dtype=dtype)
+            fd = os.open(self._file(name), os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, "r+b") as f:
+                f.seek(self.rows * data.itemsize)
+                f.write(data.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+        index = {
+            "start": self.start if self._days else (day if start is None else start),
+            "end": day + DAY,
+            "rows": self.rows + len(columns["timestamp"]),
+            "days": [*self._days, (day, self.rows)],
+        }
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.load()
+
+    def stats(self) -> dict:
+        return {
+            "days": len(self._days),
+            "rows": self.rows,
+            "covered_from": self.start,
+            "covered_until": self.end,
+            "bytes": self.rows * sum(np.dtype(d).itemsize for d in COLUMNS.values()),
+        }
+
+
+# Singleton
+archive = ColdArchive(settings.archive_dir)
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for decode_web2json_response.
+
+Decodes every proof stored in the `attestations` table. When there are
+none (mock mode, fresh checkout), the synthetic IWeb2Json.Response under
+tests/fixtures is used instead, so the numbers are comparable either way.
+
+    python bench_decode.py [iterations]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from config import settings
+from fdc import decode_web2json_response
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "tests", "fixtures", "synthetic_web2json_proof.json")
+
+
+def synthetic_fixture() -> str:
+    with open(FIXTURE) as f:
+        return json.load(f)["response_hex"]
+
+
+def stored_fixtures() -> list[str]:
+    try:
+        conn = sqlite3.connect(f"file:{settings.db_path}?mode=ro", uri=True)
+        rows = conn.execute("SELECT proof FROM attestations WHERE proof IS NOT NULL").fetchall()
+    except sqlite3.Error:
+        return []
+    return [json.loads(r[0])["response_hex"] for r in rows]
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    fixtures = stored_fixtures()
+    label = f"{len(fixtures)} stored proofs"
+    if not fixtures:
+        fixtures = [synthetic_fixture()]
+        label = "synthetic fixture"
+
+    print(decode_web2json_response(fixtures[0]))
+    started = time.perf_counter()
+    for i in range(iterations):
+        decode_web2json_response(fixtures[i % len(fixtures)])
+    elapsed = time.perf_counter() - started
+    print(f"{iterations} decodes ({label}): {elapsed * 1e6 / iterations:.1f} µs/decode")
+
+
+if __name__ == "__main__":
+    main()
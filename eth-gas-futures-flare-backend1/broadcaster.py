@@ -0,0 +1,79 @@
+"""
+In-process fan-out of new readings to /gas/stream subscribers.
+
+Every committed live reading is published once and copied into each
+subscriber's bounded queue. An idle subscriber costs one small queue and
+one parked coroutine, so a single backend can hold thousands of them.
+
+Publishing never blocks the writer: a subscriber whose queue is full is
+evicted on the spot and its stream is closed, and the client reconnects
+with `since=` to replay what it missed.
+"""
+
+import asyncio
+import logging
+
+from config import settings
+
+log = logging.getLogger("flarerisk.stream")
+
+
+class Subscriber:
+    def __init__(self, queue_size: int) -> None:
+        # Items are reading events; None means the stream is over.
+        self.queue: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    async def get(self) -> dict | None:
+        return await self.queue.get()
+
+    def _end(self) -> None:
+        # Make room for the end marker even if the queue is full.
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subscribers: set[Subscriber] = set()
+        self.published = 0
+        self.evicted = 0
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    def publish(self, event: dict) -> None:
+        self.published += 1
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._subscribers.discard(sub)
+                sub.evicted = True
+                sub._end()
+                self.evicted += 1
+                log.warning("Evicted slow stream subscriber (%d queued)", self.queue_size)
+
+    def close(self) -> None:
+        """End every open stream (used on shutdown)."""
+        for sub in self._subscribers:
+            sub._end()
+        self._subscribers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "evicted": self.evicted,
+        }
+
+
+# Singleton
+broadcaster = Broadcaster(settings.stream_queue_size)
@@ -0,0 +1,50 @@
+"""
+Columnar msgpack encoding for chart endpoints.
+
+Instead of an array of JSON objects that repeats every key per row, the
+body is one msgpack map whose `columns` hold packed little-endian typed
+arrays — a client can view them directly as Float64Array / Uint32Array
+(copy first if the offset is not aligned) or np.frombuffer:
+
+    {"count": n, ...metadata,
+     "columns": {"timestamp": {"dtype": "<u4", "data": <bin>}, ...}}
+
+Columns are built from plain lists, never from per-row objects.
+"""
+
+import sys
+from array import array
+from collections.abc import Sequence
+
+import msgpack
+import numpy as np
+
+MEDIA_TYPE = "application/msgpack"
+_ACCEPTED = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# array typecode -> numpy-style dtype string sent to clients
+_DTYPES = {"I": "<u4", "q": "<i8", "d": "<f8", "B": "u1"}
+
+
+def accepts_msgpack(accept: str | None) -> bool:
+    return bool(accept) and any(media in accept for media in _ACCEPTED)
+
+
+def _column(typecode: str, values: Sequence) -> dict:
+    if isinstance(values, np.ndarray):
+        return {"dtype": _DTYPES[typecode], "data": values.astype(_DTYPES[typecode]).tobytes()}
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return {"dtype": _DTYPES[typecode], "data": packed.tobytes()}
+
+
+def pack(columns: dict[str, tuple[str, Sequence]], **meta) -> bytes:
+    """Encode {name: (typecode, values)} columns of equal length plus metadata."""
+    count = len(next(iter(columns.values()))[1]) if columns else 0
+    body = {
+        **meta,
+        "count": count,
+        "columns": {name: _column(tc, values) for name, (tc, values) in columns.items()},
+    }
+    return msgpack.packb(body)
@@ -21,8 +21,44 @@ class Settings(BaseSettings):
     gas_api_url: str = "https://api.etherscan.io/v2/api"
     etherscan_api_key: str = ""
 
-    # Polling
+    # Direct gas sources, queried concurrently (see gas_sources.py).
+    # Etherscan is skipped while etherscan_api_key is unset.
+    gas_sources: list[str] = ["beaconcha.in", "etherscan", "eth-rpc"]
+    beaconchain_gas_url: str = "https://beaconcha.in/api/v1/execution/gasnow"
+    eth_rpc_url: str = "https://ethereum-rpc.publicnode.com"
+    # The reading is the per-tier median of the first gas_source_quorum answers
+    gas_source_quorum: int = 2
+    gas_source_timeout_seconds: float = 5.0
+    gas_fetch_deadline_seconds: float = 10.0
+    # Start a hedged request once this latency percentile has passed
+    gas_hedge_percentile: float = 0.9
+    gas_hedge_default_delay_seconds: float = 1.0
+    # Circuit breaker: skip a source after N consecutive failures, for cooldown
+    gas_breaker_failures: int = 3
+    gas_breaker_cooldown_seconds: float = 60.0
+
+    # Shared outbound HTTP client (see http_client.py)
+    http_timeout_seconds: float = 30.0
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 10
+    http_dns_cache_seconds: int = 300
+    http_keepalive_seconds: float = 60.0
+
+    # Polling: direct/mock sampling cadence, independent of attestation
     poll_interval_seconds: int = 90
+    sample_timeout_seconds: float = 30.0
+    # A new FDC attestation job is started every attest_interval_seconds
+    attest_interval_seconds: int = 90
+    attest_jitter_seconds: float = 5.0
+    attest_start_timeout_seconds: float = 60.0
+    # Periodic database upkeep (see db.run_maintenance)
+    maintenance_interval_seconds: int = 3600
+    maintenance_jitter_seconds: float = 60.0
+
+    # Concurrent FDC attestation jobs (one is started per poll tick)
+    fdc_max_in_flight: int = 4
+    # Initial guess of seconds from voting round end to Relay finalization
+    fdc_finalization_lag_seconds: int = 45
 
     # Mode: "fdc" uses Flare Data Connector, "mock" uses synthetic data
     use_mock: bool = True
@@ -33,6 +69,63 @@ class Settings(BaseSettings):
 
     # Database
     db_path: str = "gas_data.db"
+    db_reader_pool_size: int = 4
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size_kib: int = 64 * 1024
+    bulk_insert_batch_size: int = 5000
+    # Rows fetched per cursor batch when streaming /gas/history
+    history_stream_batch_size: int = 1000
+
+    # Write-behind queue: group-commit whatever is pending every N ms or N rows
+    write_batch_max_delay_ms: int = 5
+    write_batch_max_rows: int = 500
+
+    # Retention tiers (see db.compact): raw readings and 1m candles, then 5m
+    # candles; hourly and daily candles are kept forever. 0 keeps a tier forever.
+    retention_raw_days: int = 30
+    retention_5m_days: int = 365
+    # Compaction deletes in transactions of this many rows, then returns
+    # freed pages this many at a time with incremental vacuum
+    compaction_interval_seconds: int = 600
+    compaction_batch_rows: int = 2000
+    compaction_vacuum_pages: int = 1000
+    # Columnar archive (see archive.py): closed days this many days old (never
+    # inside the hot window) move out of SQLite into archive_dir. 0 disables it.
+    archive_dir: str = "gas_archive"
+    archive_seal_after_days: int = 7
+
+    # Multiple workers (see leader.py): one process holds the ingest lease
+    # and the others replay its writes from the write log
+    lease_ttl_seconds: float = 15.0
+    lease_renew_seconds: float = 5.0
+    follower_poll_seconds: float = 1.0
+    write_log_keep_entries: int = 10_000
+
+    # HTTP caching of /gas/* responses: default `to` rounds up to this many
+    # seconds, and shared caches may reuse a response for max-age seconds
+    response_quantum_seconds: int = 10
+    response_max_age_seconds: int = 5
+
+    # /gas/stream: per-subscriber queue (full = evicted), replay cap for
+    # since=, and SSE keep-alive interval
+    stream_queue_size: int = 64
+    stream_resume_max_rows: int = 1000
+    stream_heartbeat_seconds: int = 15
+
+    # Cached pre-downsampled chunks for /gas/history?max_points= (see downsample.py)
+    downsample_cache_chunks: int = 1024
+
+    # Readings kept in the shared /gas/dashboard snapshot for since= polls
+    dashboard_recent_seconds: int = 6 * 3600
+
+    # Query-result cache for aggregate/range queries (see query_cache.py)
+    query_cache_max_entries: int = 1024
+    query_cache_max_bytes: int = 64 * 1024 * 1024
+    query_cache_ttl_seconds: float = 300.0
+
+    # In-memory hot window of recent readings (see hot_window.py)
+    hot_window_days: int = 7
+    hot_window_max_rows: int = 50_000
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -0,0 +1,90 @@
+"""
+Shared snapshot behind /gas/dashboard.
+
+Every dashboard refresh wants the same things: the latest reading, the
+1d/7d/30d averages, the last day of hourly candles and the readings since
+its previous poll. The snapshot is built once per new reading (or per
+response quantum, since the windows slide) and shared by every client;
+a request only picks its averages and slices the recent readings after
+its cursor, so per-client cost does not depend on how much is stored.
+
+Concurrent requests that find the snapshot stale wait for a single
+rebuild instead of each running their own.
+"""
+
+import asyncio
+import bisect
+import logging
+
+import db
+from config import settings
+from http_cache import quantized_now
+from models import GasAverageResponse, GasCandle, GasReading
+
+log = logging.getLogger("flarerisk.dashboard")
+
+AVERAGE_WINDOWS = {"1d": 1, "7d": 7, "30d": 30}
+
+
+def _reading(r: dict) -> GasReading:
+    return GasReading(timestamp=r["timestamp"], gas_price_gwei=r["gas_price"], source=r["source"])
+
+
+class Dashboard:
+    def __init__(self) -> None:
+        self._snapshot: dict | None = None
+        self._key: tuple[int, int] | None = None
+        self._lock = asyncio.Lock()
+        self.builds = 0
+
+    def _current_key(self) -> tuple[int, int]:
+        return db.data_version()[0], quantized_now()
+
+    async def snapshot(self) -> dict:
+        if self._key != self._current_key():
+            async with self._lock:
+                key = self._current_key()
+                if self._key != key:
+                    self._snapshot = await self._build(key[1])
+                    self._key = key
+                    self.builds += 1
+        return self._snapshot
+
+    async def _build(self, now: int) -> dict:
+        latest = await db.get_latest()
+        averages = {}
+        for name, days in AVERAGE_WINDOWS.items():
+            result = await db.get_average(now - days * 86400, now)
+            averages[name] = GasAverageResponse(
+                average_gwei=round(result["avg_price"], 4),
+                days=days,
+                from_timestamp=now - days * 86400,
+                to_timestamp=now,
+                sample_count=result["count"],
+                oldest_timestamp=result["oldest"],
+                newest_timestamp=result["newest"],
+            )
+        candles = await db.get_candles("1h", now - 86400, now)
+        recent_from = now - settings.dashboard_recent_seconds
+        recent = await db.get_readings_range(recent_from, now)
+        return {
+            "generated_at": now,
+            "latest": _reading(latest) if latest else None,
+            "averages": averages,
+            "candles": [GasCandle(**c) for c in candles],
+            "recent_from": recent_from,
+            "recent_ts": [r["timestamp"] for r in recent],
+            "recent": [_reading(r) for r in recent],
+        }
+
+    @staticmethod
+    def readings_since(snapshot: dict, since: int | None) -> tuple[list[GasReading], bool]:
+        """Recent readings after `since`, and whether older ones were cut off."""
+        if since is None:
+            return snapshot["recent"], False
+        i = bisect.bisect_right(snapshot["recent_ts"], since)
+        return snapshot["recent"][i:], since < snapshot["recent_from"]
+
+
+# Singleton
+dashboard = Dashboard()
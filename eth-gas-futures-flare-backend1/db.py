@@ -1,111 +1,2014 @@
 import aiosqlite
+import asyncio
+import fcntl
+import json
+import secrets
+import sys
 import time
 import logging
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Sequence
+from contextlib import asynccontextmanager
 
+import numpy as np
+
+from archive import DAY as ARCHIVE_DAY, archive
+from broadcaster import broadcaster
 from config import settings
+from hot_window import HotWindow
+from query_cache import QueryCache
 
 log = logging.getLogger("flarerisk.db")
 
+# Single writer connection. All API reads go through the read-only pool
+# below, so WAL readers run in parallel instead of queueing behind writes.
 _db: aiosqlite.Connection | None = None
 
+_readers: asyncio.Queue | None = None
+_reader_conns: list[aiosqlite.Connection] = []
+_readers_lock = asyncio.Lock()
+
+# Serialises write transactions on the shared connection, so the group-commit
+# writer and bulk ingest never interleave statements in one transaction.
+_write_lock = asyncio.Lock()
+
+# Write-behind queue: (row, future) pairs drained by _writer_loop. A None item
+# tells the writer to flush and exit.
+_write_queue: asyncio.Queue | None = None
+_writer_task: asyncio.Task | None = None
+
+hot_window = HotWindow(settings.hot_window_days, settings.hot_window_max_rows)
+
+# Sequence number of the last write-log entry applied in this process,
+# alongside the newest reading timestamp. Shared by every worker on the
+# same database, so the API can version responses (ETags) consistently
+# without touching SQLite.
+_revision = 0
+_latest_ts = 0
+# Random id of the database file, so revisions from a replaced file are
+# never mistaken for current ones.
+_instance = ""
+
+# Retention watermarks (see compact()): raw readings are complete from
+# _raw_from on, 5-minute candles from _fine_from on; older windows are
+# answered from the next coarser rollup. Both are hour-aligned, 0 = never
+# compacted.
+_raw_from = 0
+_fine_from = 0
+# Sealed days (see seal_archive) are read from the columnar archive over
+# [archive.start, _archive_until); SQLite then holds readings from
+# _tail_from on, and raw readings of either kind reach back to _raw_start.
+_archive_until = 0
+_tail_from = 0
+_raw_start = 0
+
+# Callbacks run with (min_ts, max_ts) of every committed write, so derived
+# caches can drop what the write touched.
+_write_listeners: list[Callable[[int, int], None]] = []
+
+# Reading sources, stored as a small integer in gas_readings.source.
+SOURCES = {"mock": 0, "direct": 1, "fdc-attested": 2}
+SOURCE_NAMES = {v: k for k, v in SOURCES.items()}
+# Points standing in for compacted readings in history responses (one per
+# rollup bucket, at its mean price). Never stored in gas_readings.
+ROLLUP_SOURCE_ID = 3
+SOURCE_NAMES[ROLLUP_SOURCE_ID] = "rollup"
+
+# Gas price tiers, one column each. `standard` is the headline price (served
+# as gas_price) and the only tier kept in the rollups; the other tiers are
+# NULL for sources that do not report them (mock) and are aggregated on the fly.
+TIERS = ("rapid", "fast", "standard", "slow")
+
+# A reading as it moves through the write path:
+# (timestamp, standard, source, rapid, fast, slow)
+Reading = tuple[int, float, str, float | None, float | None, float | None]
+
+# Legacy gas_readings rows are copied into the new schema this many at a time.
+_MIGRATION_CHUNK = 10_000
+
+# Candle rollup intervals served by /gas/candles, in seconds.
+CANDLE_INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# Incremental OHLC upsert. SQLite evaluates every SET expression against the
+# pre-update row, so open/close can be compared against the old open_ts/close_ts.
+_CANDLE_UPSERT = """
+    INSERT INTO gas_candles
+        (interval_s, bucket, open_ts, open, high, low, close_ts, close, count, sum)
+    VALUES (:interval_s, :bucket, :ts, :price, :price, :price, :ts, :price, 1, :price)
+    ON CONFLICT(interval_s, bucket) DO UPDATE SET
+        open     = CASE WHEN excluded.open_ts < open_ts THEN excluded.open ELSE open END,
+        open_ts  = MIN(open_ts, excluded.open_ts),
+        high     = MAX(high, excluded.high),
+        low      = MIN(low, excluded.low),
+        close    = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close ELSE close END,
+        close_ts = MAX(close_ts, excluded.close_ts),
+        count    = count + 1,
+        sum      = sum + excluded.sum
+"""
+
+# Prefix-sum checkpoint width. Row `bucket` in gas_prefix_sums holds the
+# running sum/count of every reading with timestamp < bucket + PREFIX_BUCKET_S.
+PREFIX_BUCKET_S = 3600
+
+# TWAP series key covering every source; per-source series use the source name.
+TWAP_ALL_SOURCES = "*"
+
+# Columns of a sealed day, in archive (and SELECT) order.
+_ARCHIVE_COLUMNS = ("timestamp", *TIERS, "source")
+
+
+async def _apply_pragmas(conn: aiosqlite.Connection) -> None:
+    await conn.execute(f"PRAGMA mmap_size={settings.db_mmap_size}")
+    await conn.execute(f"PRAGMA cache_size=-{settings.db_cache_size_kib}")
+    await conn.execute("PRAGMA temp_store=MEMORY")
+
 
 async def get_db() -> aiosqlite.Connection:
+    """The writer connection. Creates the schema on first use."""
     global _db
     if _db is None:
-        _db = await aiosqlite.connect(settings.db_path)
-        _db.row_factory = aiosqlite.Row
-        await _db.execute("PRAGMA journal_mode=WAL")
-        await _db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gas_readings (
-                id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp INTEGER NOT NULL,
-                gas_price REAL    NOT NULL,
-                source    TEXT    NOT NULL
-            )
-            """
+        async with _schema_lock():
+            _db = await _open_writer()
+    return _db
+
+
+@asynccontextmanager
+async def _schema_lock():
+    """Serialise schema setup and migrations across worker processes."""
+    with open(f"{settings.db_path}.lock", "a") as f:
+        await asyncio.to_thread(fcntl.flock, f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+async def _open_writer() -> aiosqlite.Connection:
+    global _db, _instance
+    _db = await aiosqlite.connect(settings.db_path)
+    _db.row_factory = aiosqlite.Row
+    # Only takes effect on a new database (or after a manual VACUUM); lets
+    # compaction hand freed pages back to the filesystem a few at a time.
+    await _db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await _db.execute("PRAGMA journal_mode=WAL")
+    await _apply_pragmas(_db)
+    if await _has_legacy_readings(_db):
+        # Pre-tier schema (AUTOINCREMENT id, TEXT source): move it aside
+        # and copy it forward below.
+        await _db.execute("DROP INDEX IF EXISTS idx_gas_ts")
+        await _db.execute("ALTER TABLE gas_readings RENAME TO gas_readings_legacy")
+        await _db.commit()
+    # Clustered on (timestamp, source) so history range scans read the
+    # table b-tree directly, with no separate index or rowid lookups.
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gas_readings (
+            timestamp INTEGER NOT NULL,
+            source    INTEGER NOT NULL,
+            standard  REAL    NOT NULL,
+            rapid     REAL,
+            fast      REAL,
+            slow      REAL,
+            PRIMARY KEY (timestamp, source)
+        ) WITHOUT ROWID
+        """
+    )
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gas_candles (
+            interval_s INTEGER NOT NULL,
+            bucket     INTEGER NOT NULL,
+            open_ts    INTEGER NOT NULL,
+            open       REAL    NOT NULL,
+            high       REAL    NOT NULL,
+            low        REAL    NOT NULL,
+            close_ts   INTEGER NOT NULL,
+            close      REAL    NOT NULL,
+            count      INTEGER NOT NULL,
+            sum        REAL    NOT NULL,
+            PRIMARY KEY (interval_s, bucket)
+        ) WITHOUT ROWID
+        """
+    )
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gas_prefix_sums (
+            bucket    INTEGER PRIMARY KEY,
+            cum_sum   REAL    NOT NULL,
+            cum_count INTEGER NOT NULL
         )
-        await _db.execute(
-            "CREATE INDEX IF NOT EXISTS idx_gas_ts ON gas_readings(timestamp)"
+        """
+    )
+    # Step-function price series per source (plus TWAP_ALL_SOURCES).
+    # cum_integral is the integral of price dt from the series start up to
+    # `timestamp`, each price holding until the next reading.
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gas_twap_points (
+            series       TEXT    NOT NULL,
+            timestamp    INTEGER NOT NULL,
+            price        REAL    NOT NULL,
+            cum_integral REAL    NOT NULL,
+            PRIMARY KEY (series, timestamp)
+        ) WITHOUT ROWID
+        """
+    )
+    # FDC attestation jobs (see fdc.py). State advances
+    # prepared -> submitted -> finalized -> proved -> decoded, or failed.
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attestations (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            state               TEXT    NOT NULL,
+            abi_encoded_request TEXT    NOT NULL,
+            nonce               INTEGER,
+            tx_hash             TEXT,
+            raw_tx              TEXT,
+            round_id            INTEGER,
+            block_ts            INTEGER,
+            proof               TEXT,
+            result              TEXT,
+            error               TEXT,
+            created_at          INTEGER NOT NULL,
+            updated_at          INTEGER NOT NULL
         )
-        await _db.commit()
-        log.info("Database initialized at %s", settings.db_path)
+        """
+    )
+    await _db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attestations_state ON attestations(state)"
+    )
+    # One entry per committed write, in commit order. Workers that do not
+    # hold the ingest lease (see leader.py) replay it to keep their hot
+    # window, caches and stream subscribers current. `readings` holds the
+    # rows of live inserts as JSON; it is NULL for bulk inserts and
+    # compaction batches, which followers reload from SQLite instead.
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gas_write_log (
+            seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_ts  INTEGER NOT NULL,
+            to_ts    INTEGER NOT NULL,
+            readings TEXT
+        )
+        """
+    )
+    # Named leases with an expiry, held by at most one process at a time.
+    await _db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name       TEXT PRIMARY KEY,
+            holder     TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    )
+    await _db.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    await _db.execute(
+        "INSERT OR IGNORE INTO db_meta (key, value) VALUES ('instance', ?)", (secrets.token_hex(4),)
+    )
+    await _db.commit()
+    await _migrate_legacy_readings(_db)
+    if await _rollup_needs_rebuild(_db, "gas_candles"):
+        await rebuild_candles()
+    if await _rollup_needs_rebuild(_db, "gas_prefix_sums"):
+        await rebuild_prefix_sums()
+    if await _rollup_needs_rebuild(_db, "gas_twap_points"):
+        await rebuild_twap_points()
+    cursor = await _db.execute("SELECT COALESCE(MAX(timestamp), 0) AS ts FROM gas_readings")
+    _note_write([((await cursor.fetchone())["ts"],)], await _last_log_seq(_db))
+    cursor = await _db.execute("SELECT value FROM db_meta WHERE key = 'instance'")
+    _instance = (await cursor.fetchone())["value"]
+    await _load_watermarks(_db)
+    log.info("Database initialized at %s", settings.db_path)
     return _db
 
 
+def _note_write(rows: list, seq: int) -> None:
+    global _revision, _latest_ts
+    _revision = max(_revision, seq)
+    if rows:
+        lo = min(r[0] for r in rows)
+        hi = max(r[0] for r in rows)
+        _latest_ts = max(_latest_ts, hi)
+        for listener in _write_listeners:
+            listener(lo, hi)
+
+
+def on_write(listener: Callable[[int, int], None]) -> None:
+    """Register `listener(min_ts, max_ts)` to run after each committed write."""
+    _write_listeners.append(listener)
+
+
+query_cache = QueryCache(
+    settings.query_cache_max_entries,
+    settings.query_cache_max_bytes,
+    settings.query_cache_ttl_seconds,
+)
+on_write(query_cache.invalidate)
+
+
+def data_version() -> tuple[int, int]:
+    """(write revision, newest reading timestamp) as of the last commit."""
+    return _revision, _latest_ts
+
+
+def instance_id() -> str:
+    return _instance
+
+
+# ---------------------------------------------------------------------------
+# Write log (cross-worker change feed)
+# ---------------------------------------------------------------------------
+async def _last_log_seq(db: aiosqlite.Connection) -> int:
+    cursor = await db.execute("SELECT COALESCE(MAX(seq), 0) FROM gas_write_log")
+    return (await cursor.fetchone())[0]
+
+
+async def _log_write(db: aiosqlite.Connection, rows: list[Reading], live: bool) -> int:
+    """Record a write inside its transaction. Returns its sequence number."""
+    cursor = await db.execute(
+        "INSERT INTO gas_write_log (from_ts, to_ts, readings) VALUES (?, ?, ?)",
+        (
+            min(r[0] for r in rows),
+            max(r[0] for r in rows),
+            json.dumps(rows, separators=(",", ":")) if live else None,
+        ),
+    )
+    return cursor.lastrowid
+
+
+async def sync_writes() -> int:
+    """Apply write-log entries committed by another process since the last
+    call. Returns how many were applied.
+
+    Live inserts are replayed exactly as the writer applied them (hot window,
+    caches, stream subscribers); a bulk insert or compaction batch reloads
+    the hot window and retention watermarks. If
+    the log has been pruned past this process's position, everything
+    derived is rebuilt from SQLite.
+    """
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT seq, from_ts, to_ts, readings FROM gas_write_log WHERE seq > ? ORDER BY seq",
+            (_revision,),
+        )
+        entries = await cursor.fetchall()
+        if not entries:
+            return 0
+        cursor = await db.execute("SELECT MIN(seq) FROM gas_write_log")
+        oldest = (await cursor.fetchone())[0]
+    if oldest > _revision + 1:
+        log.warning("Write log pruned past revision %d; reloading", _revision)
+        await _resync(entries[-1]["seq"])
+        return len(entries)
+    reload = False
+    applied = 0
+    for entry in entries:
+        # The writer in this process may have applied it while we were reading.
+        if entry["seq"] <= _revision:
+            continue
+        applied += 1
+        if entry["readings"] is None:
+            _note_write([(entry["from_ts"],), (entry["to_ts"],)], entry["seq"])
+            reload = True
+            continue
+        rows = [tuple(r) for r in json.loads(entry["readings"])]
+        _note_write(rows, entry["seq"])
+        for row in rows:
+            hot_window.append(row[0], row[1], row[2])
+            broadcaster.publish(_reading_event(*row))
+    if reload:
+        async with _reader() as db:
+            await _load_watermarks(db)
+        await load_hot_window()
+    return applied
+
+
+async def _resync(seq: int) -> None:
+    global _revision, _latest_ts
+    await load_hot_window()
+    async with _reader() as db:
+        await _load_watermarks(db)
+        cursor = await db.execute("SELECT COALESCE(MAX(timestamp), 0) FROM gas_readings")
+        _latest_ts = (await cursor.fetchone())[0]
+    _revision = max(_revision, seq)
+    for listener in _write_listeners:
+        listener(0, sys.maxsize)
+
+
+async def _has_legacy_readings(db: aiosqlite.Connection) -> bool:
+    cursor = await db.execute("PRAGMA table_info(gas_readings)")
+    return any(col["name"] == "id" for col in await cursor.fetchall())
+
+
+async def _migrate_legacy_readings(db: aiosqlite.Connection) -> None:
+    """Copy gas_readings_legacy into the tiered schema in committed chunks.
+
+    Safe to interrupt: the legacy table is only dropped once everything has
+    been copied, and re-copied rows are ignored by the primary key. Rollups
+    are cleared afterwards so they are rebuilt against the migrated rows.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gas_readings_legacy'"
+    )
+    if await cursor.fetchone() is None:
+        return
+    cursor = await db.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM gas_readings_legacy")
+    max_id = (await cursor.fetchone())["max_id"]
+    source_case = " ".join(f"WHEN '{name}' THEN {sid}" for name, sid in SOURCES.items())
+    log.info("Migrating %d legacy gas_readings rows to tiered schema...", max_id)
+    for low in range(0, max_id, _MIGRATION_CHUNK):
+        await db.execute(
+            f"""
+            INSERT OR IGNORE INTO gas_readings (timestamp, source, standard)
+            SELECT timestamp, CASE source {source_case} END, gas_price
+            FROM gas_readings_legacy WHERE id > ? AND id <= ?
+            """,
+            (low, low + _MIGRATION_CHUNK),
+        )
+        await db.commit()
+    cursor = await db.execute(
+        "SELECT (SELECT COUNT(*) FROM gas_readings_legacy) - (SELECT COUNT(*) FROM gas_readings) AS skipped"
+    )
+    skipped = (await cursor.fetchone())["skipped"]
+    if skipped:
+        log.warning("Skipped %d legacy readings (duplicate timestamp/source or unknown source)", skipped)
+    await db.execute("DROP TABLE gas_readings_legacy")
+    for table in ("gas_candles", "gas_prefix_sums", "gas_twap_points"):
+        await db.execute(f"DELETE FROM {table}")
+    await db.commit()
+    log.info("Legacy gas_readings migration complete")
+
+
+def _source_id(source: str) -> int:
+    try:
+        return SOURCES[source]
+    except KeyError:
+        raise ValueError(f"Unknown reading source {source!r}") from None
+
+
+def _tier_column(tier: str) -> str:
+    if tier not in TIERS:
+        raise ValueError(f"Unknown gas tier {tier!r}")
+    return tier
+
+
+def _row_to_reading(r) -> dict:
+    return {"timestamp": r["timestamp"], "gas_price": r["gas_price"], "source": SOURCE_NAMES[r["source"]]}
+
+
+def _rollup_spans(from_ts: int, to_ts: int) -> list[tuple[int, int, int]]:
+    """(interval_s, lo, hi) pieces of [from_ts, to_ts] older than the raw
+    readings, each paired with the finest candles still kept for it."""
+    hi = min(to_ts, _raw_start - 1)
+    if from_ts > hi:
+        return []
+    spans = []
+    if from_ts < _fine_from:
+        spans.append((3600, from_ts, min(hi, _fine_from - 1)))
+    if hi >= _fine_from:
+        spans.append((300, max(from_ts, _fine_from), hi))
+    return spans
+
+
+async def _rollup_points(
+    db: aiosqlite.Connection, from_ts: int, to_ts: int, limit: int = -1
+) -> list[tuple[int, float, int]]:
+    """Stand-in (timestamp, price, source id) readings for the compacted part
+    of [from_ts, to_ts]: one per candle starting in it, at its mean price."""
+    points = []
+    for size, lo, hi in _rollup_spans(from_ts, to_ts):
+        cursor = await db.execute(
+            "SELECT bucket, sum / count FROM gas_candles "
+            "WHERE interval_s = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket LIMIT ?",
+            (size, lo, hi, limit if limit < 0 else limit - len(points)),
+        )
+        points.extend((r[0], r[1], ROLLUP_SOURCE_ID) for r in await cursor.fetchall())
+    return points
+
+
+def _point_to_reading(p: tuple[int, float, int]) -> dict:
+    return {"timestamp": p[0], "gas_price": p[1], "source": SOURCE_NAMES[p[2]]}
+
+
+def _archived(
+    col: str, from_ts: int, to_ts: int, source: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sealed readings of tier `col` in [from_ts, to_ts] as (timestamps,
+    prices, source ids) views onto the archive."""
+    return archive.read(col, max(from_ts, archive.start), min(to_ts, _archive_until - 1), source)
+
+
+def _columns_to_readings(ts: np.ndarray, price: np.ndarray, source: np.ndarray) -> list[dict]:
+    return [
+        {"timestamp": t, "gas_price": p, "source": SOURCE_NAMES[s]}
+        for t, p, s in zip(ts.tolist(), price.tolist(), source.tolist())
+    ]
+
+
+def _rows_to_columns(rows: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ts, price, source = zip(*rows)
+    return np.array(ts, np.int64), np.array(price, np.float64), np.array(source, np.uint8)
+
+
+async def _open_readers() -> asyncio.Queue:
+    global _readers
+    async with _readers_lock:
+        if _readers is None:
+            await get_db()  # schema must exist before read-only connections attach
+            pool: asyncio.Queue = asyncio.Queue()
+            for _ in range(settings.db_reader_pool_size):
+                conn = await aiosqlite.connect(f"file:{settings.db_path}?mode=ro", uri=True)
+                conn.row_factory = aiosqlite.Row
+                await _apply_pragmas(conn)
+                _reader_conns.append(conn)
+                pool.put_nowait(conn)
+            _readers = pool
+            log.info("Opened %d read-only connections", settings.db_reader_pool_size)
+    return _readers
+
+
+@asynccontextmanager
+async def _reader():
+    """Check out a read-only connection from the pool."""
+    pool = _readers or await _open_readers()
+    conn = await pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put_nowait(conn)
+
+
 async def close_db() -> None:
-    global _db
+    global _db, _readers
+    for conn in _reader_conns:
+        await conn.close()
+    _reader_conns.clear()
+    _readers = None
     if _db is not None:
         await _db.close()
         _db = None
 
 
-async def insert_reading(timestamp: int, gas_price: float, source: str) -> None:
+async def insert_reading(
+    timestamp: int,
+    gas_price: float,
+    source: str,
+    durable: bool = False,
+    rapid: float | None = None,
+    fast: float | None = None,
+    slow: float | None = None,
+) -> None:
+    """Queue a reading for the group-commit writer.
+
+    `gas_price` is the standard tier; the other tiers are optional. Returns
+    as soon as the row is queued; pass durable=True to wait until it has been
+    committed. Without a running writer (scripts, one-off tools) the row is
+    written and committed inline. A second reading for the same
+    (timestamp, source) is ignored.
+    """
+    _source_id(source)
+    row = (timestamp, gas_price, source, rapid, fast, slow)
+    if _write_queue is None:
+        await _commit_rows([row])
+        return
+    done = asyncio.get_running_loop().create_future() if durable else None
+    await _write_queue.put((row, done))
+    if done is not None:
+        await done
+
+
+async def start_writer() -> None:
+    global _write_queue, _writer_task
+    if _writer_task is None:
+        _write_queue = asyncio.Queue()
+        _writer_task = asyncio.create_task(_writer_loop(_write_queue))
+
+
+async def stop_writer() -> None:
+    """Flush every queued row, then stop the writer. Called on shutdown."""
+    global _write_queue, _writer_task
+    if _writer_task is None:
+        return
+    queue, task = _write_queue, _writer_task
+    _write_queue, _writer_task = None, None
+    await queue.put(None)
+    await task
+
+
+async def _writer_loop(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    max_delay = settings.write_batch_max_delay_ms / 1000
+    while True:
+        item = await queue.get()
+        stopping = item is None
+        batch = [] if stopping else [item]
+        deadline = loop.time() + max_delay
+        while not stopping and len(batch) < settings.write_batch_max_rows:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+        if batch:
+            await _commit_queued(batch)
+        if stopping:
+            log.info("Write queue flushed")
+            return
+
+
+async def _commit_queued(batch: list) -> None:
+    try:
+        await _commit_rows([row for row, _ in batch])
+    except Exception as e:
+        log.error("Group commit of %d readings failed: %s", len(batch), e, exc_info=True)
+        for _, done in batch:
+            if done is not None and not done.done():
+                done.set_exception(e)
+        return
+    for _, done in batch:
+        if done is not None and not done.done():
+            done.set_result(None)
+
+
+async def _commit_rows(rows: list[Reading]) -> None:
+    db = await get_db()
+    async with _write_lock:
+        try:
+            inserted = await _insert_batch(db, rows)
+            seq = await _log_write(db, inserted, live=True) if inserted else 0
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    _note_write(inserted, seq)
+    for row in inserted:
+        hot_window.append(row[0], row[1], row[2])
+        broadcaster.publish(_reading_event(*row))
+
+
+def _reading_event(
+    ts: int, price: float, source: str, rapid: float | None, fast: float | None, slow: float | None
+) -> dict:
+    """A reading as pushed on /gas/stream: the standard price plus every tier."""
+    return {
+        "timestamp": ts,
+        "gas_price_gwei": price,
+        "source": source,
+        "tiers": {"rapid": rapid, "fast": fast, "standard": price, "slow": slow},
+    }
+
+
+async def insert_readings_bulk(
+    readings: Iterable[dict] | AsyncIterable[dict],
+    batch_size: int | None = None,
+) -> int:
+    """Insert many readings in one transaction. Used for seeding and backfills.
+
+    `readings` yields dicts with timestamp/gas_price/source keys (plus
+    optional rapid/fast/slow tiers) and may be a plain or async iterable.
+    Rows go in via executemany in batches of `batch_size`, with
+    synchronous=OFF for the duration and a single commit at the end.
+    Rollups are maintained per batch. Returns the row count.
+    """
+    async with _write_lock:
+        inserted, seq = await _insert_bulk_locked(readings, batch_size or settings.bulk_insert_batch_size)
+    _note_write(inserted, seq)
+    for ts, price, source, *_ in sorted(inserted, key=lambda r: r[0]):
+        hot_window.append(ts, price, source)
+    log.info("Bulk inserted %d readings", len(inserted))
+    return len(inserted)
+
+
+async def _insert_bulk_locked(
+    readings: Iterable[dict] | AsyncIterable[dict], batch_size: int
+) -> tuple[list[Reading], int]:
+    db = await get_db()
+    cursor = await db.execute("PRAGMA synchronous")
+    prev_sync = (await cursor.fetchone())[0]
+    await db.execute("PRAGMA synchronous=OFF")
+    inserted: list[Reading] = []
+    batch: list[Reading] = []
+    try:
+        if isinstance(readings, AsyncIterable):
+            async for r in readings:
+                batch.append(_reading_from_dict(r))
+                if len(batch) >= batch_size:
+                    inserted.extend(await _insert_batch(db, batch))
+                    batch = []
+        else:
+            for r in readings:
+                batch.append(_reading_from_dict(r))
+                if len(batch) >= batch_size:
+                    inserted.extend(await _insert_batch(db, batch))
+                    batch = []
+        if batch:
+            inserted.extend(await _insert_batch(db, batch))
+        seq = await _log_write(db, inserted, live=False) if inserted else 0
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        await db.execute(f"PRAGMA synchronous={int(prev_sync)}")
+    return inserted, seq
+
+
+def _reading_from_dict(r: dict) -> Reading:
+    _source_id(r["source"])
+    return (r["timestamp"], r["gas_price"], r["source"], r.get("rapid"), r.get("fast"), r.get("slow"))
+
+
+async def _insert_batch(db: aiosqlite.Connection, rows: list[Reading]) -> list[Reading]:
+    """Write new readings and fold them into the rollups. Returns the rows
+    actually inserted: duplicates of an existing (timestamp, source) are
+    dropped up front so they are never counted twice in the rollups.
+
+    History before _tail_from is closed — sealed into the archive or
+    already rolled up — so readings for it are dropped too: they would be
+    counted again in the rollups and no read path would ever see the row.
+    """
+    closed = sum(1 for r in rows if r[0] < _tail_from)
+    if closed:
+        log.warning("Ignored %d readings before %d (sealed or compacted history)", closed, _tail_from)
+        rows = [r for r in rows if r[0] >= _tail_from]
+        if not rows:
+            return rows
+    cursor = await db.execute(
+        "SELECT timestamp, source FROM gas_readings WHERE timestamp >= ? AND timestamp <= ?",
+        (min(r[0] for r in rows), max(r[0] for r in rows)),
+    )
+    seen = {(r["timestamp"], SOURCE_NAMES[r["source"]]) for r in await cursor.fetchall()}
+    fresh = []
+    for row in rows:
+        if (row[0], row[2]) not in seen:
+            seen.add((row[0], row[2]))
+            fresh.append(row)
+    if len(fresh) < len(rows):
+        log.debug("Ignored %d duplicate readings", len(rows) - len(fresh))
+    if not fresh:
+        return fresh
+    rows = fresh
+
+    await db.executemany(
+        "INSERT INTO gas_readings (timestamp, source, standard, rapid, fast, slow) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(ts, SOURCES[source], price, rapid, fast, slow) for ts, price, source, rapid, fast, slow in rows],
+    )
+    await db.executemany(
+        _CANDLE_UPSERT, [p for ts, price, *_ in rows for p in _candle_params(ts, price)]
+    )
+    await _add_to_prefix_sums(db, _prefix_deltas(rows))
+    by_series: dict[str, list[tuple[int, float]]] = {TWAP_ALL_SOURCES: []}
+    for ts, price, source, *_ in rows:
+        by_series[TWAP_ALL_SOURCES].append((ts, price))
+        by_series.setdefault(source, []).append((ts, price))
+    for series, points in by_series.items():
+        await _append_twap_points(db, series, points)
+    return rows
+
+
+async def _append_twap_points(db: aiosqlite.Connection, series: str, points: list[tuple[int, float]]) -> None:
+    # Fast path: the whole batch lies after the series' last point, so the
+    # integral can be carried forward in Python and written with executemany.
+    # Anything else (a backfill into the middle of history) goes point by point.
+    cursor = await db.execute(
+        "SELECT timestamp, price, cum_integral FROM gas_twap_points "
+        "WHERE series = ? ORDER BY timestamp DESC LIMIT 1",
+        (series,),
+    )
+    last = await cursor.fetchone()
+    if last is not None and min(ts for ts, _ in points) <= last["timestamp"]:
+        for ts, price in points:
+            await _add_to_twap(db, series, ts, price)
+        return
+
+    latest: dict[int, float] = {}
+    for ts, price in points:
+        latest[ts] = price  # same-second readings: latest wins
+    rows = []
+    prev_ts, prev_price, cum = (last["timestamp"], last["price"], last["cum_integral"]) if last else (None, 0.0, 0.0)
+    for ts in sorted(latest):
+        if prev_ts is not None:
+            cum += prev_price * (ts - prev_ts)
+        rows.append((series, ts, latest[ts], cum))
+        prev_ts, prev_price = ts, latest[ts]
+    await db.executemany(
+        "INSERT INTO gas_twap_points (series, timestamp, price, cum_integral) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+
+
+async def load_hot_window() -> None:
+    """Populate the in-memory hot window from SQLite. Called once at startup."""
+    async with _reader() as db:
+        since_ts = int(time.time()) - hot_window.span
+        cursor = await db.execute(
+            "SELECT timestamp, standard, source FROM gas_readings "
+            "WHERE timestamp >= ? ORDER BY timestamp ASC",
+            (since_ts,),
+        )
+        rows = await cursor.fetchall()
+        total = await _count_readings(db)
+        hot_window.load([(r[0], r[1], SOURCE_NAMES[r[2]]) for r in rows], since_ts, total)
+
+
+def _candle_params(timestamp: int, gas_price: float) -> list[dict]:
+    return [
+        {
+            "interval_s": size,
+            "bucket": timestamp - timestamp % size,
+            "ts": timestamp,
+            "price": gas_price,
+        }
+        for size in CANDLE_INTERVALS.values()
+    ]
+
+
+def _prefix_deltas(rows: list[Reading]) -> dict[int, tuple[float, int]]:
+    deltas: dict[int, tuple[float, int]] = {}
+    for ts, price, *_ in rows:
+        bucket = ts - ts % PREFIX_BUCKET_S
+        total, count = deltas.get(bucket, (0.0, 0))
+        deltas[bucket] = (total + price, count + 1)
+    return deltas
+
+
+async def _add_to_prefix_sums(db: aiosqlite.Connection, deltas: dict[int, tuple[float, int]]) -> None:
+    # Seed a checkpoint from its predecessor if this is the bucket's first
+    # reading, then add the running delta to each run of checkpoints between
+    # touched buckets, so every existing row is updated at most once. Readings
+    # almost always land in the newest bucket, so this normally touches one row.
+    buckets = sorted(deltas)
+    for bucket in buckets:
+        await db.execute(
+            """
+            INSERT OR IGNORE INTO gas_prefix_sums (bucket, cum_sum, cum_count)
+            SELECT :bucket, COALESCE(MAX(cum_sum), 0.0), COALESCE(MAX(cum_count), 0)
+            FROM (SELECT cum_sum, cum_count FROM gas_prefix_sums
+                  WHERE bucket < :bucket ORDER BY bucket DESC LIMIT 1)
+            """,
+            {"bucket": bucket},
+        )
+    run_sum, run_count = 0.0, 0
+    for i, bucket in enumerate(buckets):
+        run_sum += deltas[bucket][0]
+        run_count += deltas[bucket][1]
+        upper = buckets[i + 1] if i + 1 < len(buckets) else None
+        if upper is None:
+            await db.execute(
+                "UPDATE gas_prefix_sums SET cum_sum = cum_sum + ?, cum_count = cum_count + ? "
+                "WHERE bucket >= ?",
+                (run_sum, run_count, bucket),
+            )
+        else:
+            await db.execute(
+                "UPDATE gas_prefix_sums SET cum_sum = cum_sum + ?, cum_count = cum_count + ? "
+                "WHERE bucket >= ? AND bucket < ?",
+                (run_sum, run_count, bucket, upper),
+            )
+
+
+async def _add_to_twap(db: aiosqlite.Connection, series: str, timestamp: int, gas_price: float) -> None:
+    cursor = await db.execute(
+        "SELECT timestamp, price, cum_integral FROM gas_twap_points "
+        "WHERE series = ? AND timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+        (series, timestamp),
+    )
+    prev = await cursor.fetchone()
+    cursor = await db.execute(
+        "SELECT timestamp, cum_integral FROM gas_twap_points "
+        "WHERE series = ? AND timestamp > ? ORDER BY timestamp ASC LIMIT 1",
+        (series, timestamp),
+    )
+    nxt = await cursor.fetchone()
+
+    if prev is None:
+        # New head of the series: anchor its integral so later points stay valid.
+        cum = nxt["cum_integral"] - gas_price * (nxt["timestamp"] - timestamp) if nxt else 0.0
+        replaced_price = None
+    elif prev["timestamp"] == timestamp:
+        # Same-second reading (e.g. direct + fdc-attested): latest price wins.
+        cum = prev["cum_integral"]
+        replaced_price = prev["price"]
+    else:
+        cum = prev["cum_integral"] + prev["price"] * (timestamp - prev["timestamp"])
+        replaced_price = prev["price"]
+
+    await db.execute(
+        "INSERT OR REPLACE INTO gas_twap_points (series, timestamp, price, cum_integral) "
+        "VALUES (?, ?, ?, ?)",
+        (series, timestamp, gas_price, cum),
+    )
+    # Out-of-order insert: the segment up to the next point now carries the
+    # new price instead of the previous one, so shift every later integral.
+    if nxt is not None and replaced_price is not None:
+        delta = (gas_price - replaced_price) * (nxt["timestamp"] - timestamp)
+        await db.execute(
+            "UPDATE gas_twap_points SET cum_integral = cum_integral + ? "
+            "WHERE series = ? AND timestamp > ?",
+            (delta, series, timestamp),
+        )
+
+
+async def _rollup_needs_rebuild(db: aiosqlite.Connection, table: str) -> bool:
+    cursor = await db.execute(f"SELECT 1 FROM {table} LIMIT 1")
+    if await cursor.fetchone() is not None:
+        return False
+    cursor = await db.execute("SELECT 1 FROM gas_readings LIMIT 1")
+    return await cursor.fetchone() is not None
+
+
+async def rebuild_candles() -> None:
+    """Recompute every candle rollup from scratch out of gas_readings.
+
+    Runs automatically the first time the rollup table is created on a
+    database that already holds readings.
+    """
+    db = await get_db()
+    await db.execute("DELETE FROM gas_candles")
+    for size in CANDLE_INTERVALS.values():
+        await db.execute(
+            """
+            INSERT INTO gas_candles
+                (interval_s, bucket, open_ts, open, high, low, close_ts, close, count, sum)
+            SELECT :size, bucket, MIN(timestamp), first, MAX(standard), MIN(standard),
+                   MAX(timestamp), last, COUNT(*), SUM(standard)
+            FROM (
+                SELECT timestamp, standard, timestamp - timestamp % :size AS bucket,
+                       FIRST_VALUE(standard) OVER w AS first,
+                       LAST_VALUE(standard)  OVER w AS last
+                FROM gas_readings
+                WINDOW w AS (
+                    PARTITION BY timestamp - timestamp % :size
+                    ORDER BY timestamp, source
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                )
+            )
+            GROUP BY bucket
+            """,
+            {"size": size},
+        )
+    await db.commit()
+    log.info("Rebuilt candle rollups for %s", ", ".join(CANDLE_INTERVALS))
+
+
+async def rebuild_prefix_sums() -> None:
+    """Recompute the prefix-sum checkpoints from scratch out of gas_readings."""
     db = await get_db()
+    await db.execute("DELETE FROM gas_prefix_sums")
     await db.execute(
-        "INSERT INTO gas_readings (timestamp, gas_price, source) VALUES (?, ?, ?)",
-        (timestamp, gas_price, source),
+        """
+        INSERT INTO gas_prefix_sums (bucket, cum_sum, cum_count)
+        SELECT bucket,
+               SUM(s) OVER (ORDER BY bucket),
+               SUM(c) OVER (ORDER BY bucket)
+        FROM (
+            SELECT timestamp - timestamp % :size AS bucket,
+                   SUM(standard) AS s, COUNT(*) AS c
+            FROM gas_readings GROUP BY bucket
+        )
+        """,
+        {"size": PREFIX_BUCKET_S},
     )
     await db.commit()
+    log.info("Rebuilt prefix-sum checkpoints")
 
 
-async def get_latest() -> dict | None:
+async def rebuild_twap_points() -> None:
+    """Recompute every TWAP integral series from scratch out of gas_readings."""
     db = await get_db()
+    await db.execute("DELETE FROM gas_twap_points")
+    cursor = await db.execute("SELECT DISTINCT source FROM gas_readings")
+    series = [TWAP_ALL_SOURCES] + [SOURCE_NAMES[r["source"]] for r in await cursor.fetchall()]
+    for name in series:
+        await db.execute(
+            """
+            INSERT INTO gas_twap_points (series, timestamp, price, cum_integral)
+            SELECT :series, timestamp, price,
+                   COALESCE(SUM(seg) OVER (ORDER BY timestamp), 0.0)
+            FROM (
+                SELECT timestamp, price,
+                       LAG(price) OVER (ORDER BY timestamp)
+                       * (timestamp - LAG(timestamp) OVER (ORDER BY timestamp)) AS seg
+                FROM (
+                    -- Same-second readings: the incremental path keeps the
+                    -- latest arrival; fdc-attested lands after direct, so the
+                    -- higher source id stands in for arrival order here.
+                    SELECT timestamp, standard AS price,
+                           ROW_NUMBER() OVER (PARTITION BY timestamp ORDER BY source DESC) AS rn
+                    FROM gas_readings
+                    WHERE :series = :all OR source = :source_id
+                )
+                WHERE rn = 1
+            )
+            """,
+            {"series": name, "all": TWAP_ALL_SOURCES, "source_id": SOURCES.get(name, -1)},
+        )
+    await db.commit()
+    log.info("Rebuilt TWAP integrals for %d series", len(series))
+
+
+async def get_latest(tier: str = "standard") -> dict | None:
+    col = _tier_column(tier)
+    if col == "standard":
+        cached = hot_window.latest()
+        if cached is not None:
+            return cached
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"SELECT timestamp, {col} AS gas_price, source FROM gas_readings "
+            f"WHERE {col} IS NOT NULL ORDER BY timestamp DESC, source DESC LIMIT 1"
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        return _row_to_reading(row)
+
+
+async def get_readings_since(since_ts: int) -> list[dict]:
+    cached = hot_window.range(since_ts)
+    if cached is not None:
+        return cached
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT timestamp, standard AS gas_price, source FROM gas_readings "
+            "WHERE timestamp >= ? ORDER BY timestamp ASC",
+            (since_ts,),
+        )
+        return [_row_to_reading(r) for r in await cursor.fetchall()]
+
+
+@query_cache.cached(window=lambda from_ts, to_ts, tier="standard": (from_ts, to_ts))
+async def get_readings_range(from_ts: int, to_ts: int, tier: str = "standard") -> list[dict]:
+    col = _tier_column(tier)
+    if col == "standard":
+        cached = hot_window.range(from_ts, to_ts)
+        if cached is not None:
+            return cached
+    async with _reader() as db:
+        rows = []
+        if col == "standard":
+            rows = [_point_to_reading(p) for p in await _rollup_points(db, from_ts, to_ts)]
+        rows += _columns_to_readings(*_archived(col, from_ts, to_ts))
+        cursor = await db.execute(
+            f"SELECT timestamp, {col} AS gas_price, source FROM gas_readings "
+            f"WHERE timestamp >= ? AND timestamp <= ? AND {col} IS NOT NULL ORDER BY timestamp ASC",
+            (max(from_ts, _tail_from), to_ts),
+        )
+        return rows + [_row_to_reading(r) for r in await cursor.fetchall()]
+
+
+async def get_readings_page(
+    from_ts: int, to_ts: int, limit: int, after: int | None = None, tier: str = "standard"
+) -> tuple[list[dict], int | None]:
+    """One keyset page of readings in [from_ts, to_ts] with timestamp > after.
+
+    Returns (rows, next_after); next_after is None on the last page. A page
+    never ends part-way through a timestamp, so `after=next_after` resumes
+    without skipping same-second readings from other sources. Compacted
+    history comes first, one rollup point per timestamp.
+    """
+    col = _tier_column(tier)
+    lo = from_ts if after is None else max(from_ts, after + 1)
+    head: list[dict] = []
+    if col == "standard" and lo < _raw_start:
+        async with _reader() as db:
+            points = await _rollup_points(db, lo, to_ts, limit + 1)
+        head = [_point_to_reading(p) for p in points[:limit]]
+        if len(head) == limit:
+            return head, head[-1]["timestamp"]
+        limit -= len(head)
+    lo = max(lo, _raw_start)
+    rows, next_after = await _raw_page(col, lo, to_ts, limit)
+    return head + rows, next_after
+
+
+async def _raw_page(col: str, lo: int, to_ts: int, limit: int) -> tuple[list[dict], int | None]:
+    # At most one reading per source per timestamp, so this many rows are
+    # enough to see whether the limit splits the last timestamp.
+    wanted = limit + len(SOURCES)
+    ts, price, source = _archived(col, lo, to_ts)
+    tail_from = _tail_from
+    rows = _columns_to_readings(ts[:wanted], price[:wanted], source[:wanted])
+    if len(rows) < wanted:
+        async with _reader() as db:
+            cursor = await db.execute(
+                f"SELECT timestamp, {col} AS gas_price, source FROM gas_readings "
+                f"WHERE timestamp >= ? AND timestamp <= ? AND {col} IS NOT NULL "
+                "ORDER BY timestamp, source LIMIT ?",
+                (max(lo, tail_from), to_ts, wanted - len(rows)),
+            )
+            rows += [_row_to_reading(r) for r in await cursor.fetchall()]
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]["timestamp"]
+    page = rows[:limit]
+    if rows[limit]["timestamp"] == last:
+        page = [r for r in page if r["timestamp"] < last] or [
+            r for r in rows if r["timestamp"] == last
+        ]
+    return page, page[-1]["timestamp"]
+
+
+async def iter_readings(
+    from_ts: int, to_ts: int, tier: str = "standard", after: int | None = None
+) -> AsyncIterator[list[dict]]:
+    """Yield readings in [from_ts, to_ts] in batches.
+
+    Only one batch is held in memory at a time, however long the range. A
+    reader connection is checked out per batch and returned before the
+    batch is yielded, so a slow client never ties up the pool; the raw
+    readings are paged by (timestamp, source) keyset.
+    """
+    col = _tier_column(tier)
+    lo = from_ts if after is None else max(from_ts, after + 1)
+    batch = settings.history_stream_batch_size
+    if col == "standard":
+        async with _reader() as db:
+            points = await _rollup_points(db, lo, to_ts)
+        for i in range(0, len(points), batch):
+            yield [_point_to_reading(p) for p in points[i : i + batch]]
+    # Taken together, so a day sealed while batches are out is neither
+    # skipped nor repeated.
+    ts, price, source = _archived(col, lo, to_ts)
+    tail_from = _tail_from
+    for i in range(0, len(ts), batch):
+        yield _columns_to_readings(ts[i : i + batch], price[i : i + batch], source[i : i + batch])
+    # Source ids are never negative, so the first page starts at the first
+    # reading at or after the tail's start.
+    key = (max(lo, tail_from), -1)
+    while True:
+        async with _reader() as db:
+            cursor = await db.execute(
+                f"SELECT timestamp, {col} AS gas_price, source FROM gas_readings "
+                f"WHERE (timestamp, source) > (?, ?) AND timestamp <= ? AND {col} IS NOT NULL "
+                "ORDER BY timestamp, source LIMIT ?",
+                (*key, to_ts, batch),
+            )
+            rows = await cursor.fetchall()
+        if not rows:
+            return
+        key = (rows[-1]["timestamp"], rows[-1]["source"])
+        yield [_row_to_reading(r) for r in rows]
+        if len(rows) < batch:
+            return
+
+
+async def get_stream_backfill(from_ts: int, limit: int) -> list[dict]:
+    """The newest `limit` readings with timestamp >= from_ts, oldest first,
+    as /gas/stream events — replayed to a client resuming with since=."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT timestamp, standard, source, rapid, fast, slow FROM gas_readings "
+            "WHERE timestamp >= ? ORDER BY timestamp DESC, source DESC LIMIT ?",
+            (from_ts, limit),
+        )
+        rows = await cursor.fetchall()
+    return [
+        _reading_event(r[0], r[1], SOURCE_NAMES[r[2]], r[3], r[4], r[5]) for r in reversed(rows)
+    ]
+
+
+async def get_reading_columns(
+    from_ts: int, to_ts: int, tier: str = "standard", after: int | None = None
+) -> tuple[Sequence[int], Sequence[float], Sequence[int]]:
+    """Readings in [from_ts, to_ts] as (timestamps, prices, source ids) columns.
+
+    Same rows as get_readings_range, without building a dict per row: lists
+    from the hot window, otherwise NumPy arrays. A range that lies wholly
+    in the archive comes back as views onto its mapped files.
+    """
+    col = _tier_column(tier)
+    lo = from_ts if after is None else max(from_ts, after + 1)
+    if col == "standard":
+        cached = hot_window.columns(lo, to_ts)
+        if cached is not None:
+            ts, price, source = cached
+            return ts, price, [SOURCES[s] for s in source]
+    archived = _archived(col, lo, to_ts)
+    tail_from = _tail_from
+    async with _reader() as db:
+        head = await _rollup_points(db, lo, to_ts) if col == "standard" else []
+        cursor = await db.execute(
+            f"SELECT timestamp, {col}, source FROM gas_readings "
+            f"WHERE timestamp >= ? AND timestamp <= ? AND {col} IS NOT NULL ORDER BY timestamp ASC",
+            (max(lo, tail_from), to_ts),
+        )
+        cursor.row_factory = None
+        tail = await cursor.fetchall()
+    if not head and not tail:
+        return archived
+    parts = [archived]
+    if head:
+        parts.insert(0, _rows_to_columns(head))
+    if tail:
+        parts.append(_rows_to_columns(tail))
+    ts, price, source = (np.concatenate(column) for column in zip(*parts))
+    return ts, price, source
+
+
+async def has_readings(from_ts: int, to_ts: int) -> bool:
+    """Whether any reading (or rollup point) falls in [from_ts, to_ts]."""
+    if from_ts > _latest_ts:
+        return False
+    async with _reader() as db:
+        if await _rollup_points(db, from_ts, to_ts, 1):
+            return True
+        if archive.count(max(from_ts, archive.start), min(to_ts, _archive_until - 1)):
+            return True
+        cursor = await db.execute(
+            "SELECT 1 FROM gas_readings WHERE timestamp >= ? AND timestamp <= ? LIMIT 1",
+            (max(from_ts, _tail_from), to_ts),
+        )
+        return await cursor.fetchone() is not None
+
+
+async def get_average_since(since_ts: int) -> dict:
+    return await get_average(since_ts, int(time.time()))
+
+
+@query_cache.cached(window=lambda from_ts, to_ts, tier="standard": (from_ts, to_ts))
+async def get_average(from_ts: int, to_ts: int, tier: str = "standard") -> dict:
+    """Average, count and oldest/newest timestamps of readings in [from_ts, to_ts].
+
+    Only the standard tier is backed by the hot window and prefix sums; the
+    other tiers are aggregated straight off the (timestamp, source) key.
+    """
+    col = _tier_column(tier)
+    if col != "standard":
+        ts, price, _ = _archived(col, from_ts, to_ts)
+        tail_from = _tail_from
+        async with _reader() as db:
+            cursor = await db.execute(
+                f"SELECT SUM({col}) AS total, COUNT({col}) AS count, "
+                f"MIN(timestamp) AS oldest, MAX(timestamp) AS newest FROM gas_readings "
+                f"WHERE timestamp >= ? AND timestamp <= ? AND {col} IS NOT NULL",
+                (max(from_ts, tail_from), to_ts),
+            )
+            row = await cursor.fetchone()
+        count = row["count"] + len(ts)
+        if not count:
+            return {"avg_price": 0.0, "count": 0, "oldest": 0, "newest": 0}
+        return {
+            "avg_price": ((row["total"] or 0.0) + float(price.sum())) / count,
+            "count": count,
+            "oldest": int(ts[0]) if len(ts) else row["oldest"],
+            "newest": row["newest"] if row["count"] else int(ts[-1]),
+        }
+    cached = hot_window.average(from_ts, to_ts)
+    if cached is not None:
+        return cached
+    async with _reader() as db:
+        total, count = await _sum_between(db, from_ts, to_ts)
+        if count == 0:
+            return {"avg_price": 0.0, "count": 0, "oldest": 0, "newest": 0}
+        oldest = newest = None
+        archived = _archived("standard", from_ts, to_ts)[0]
+        tail_from = _tail_from
+        if from_ts < _raw_start:
+            # Hourly candles are kept forever and record exact first/last times.
+            cursor = await db.execute(
+                "SELECT open_ts FROM gas_candles WHERE interval_s = 3600 AND bucket >= ? "
+                "AND open_ts >= ? ORDER BY bucket LIMIT 1",
+                (from_ts - from_ts % 3600, from_ts),
+            )
+            row = await cursor.fetchone()
+            oldest = row and row[0]
+        if oldest is None and len(archived):
+            oldest = int(archived[0])
+        if oldest is None:
+            cursor = await db.execute(
+                "SELECT MIN(timestamp) as oldest FROM gas_readings WHERE timestamp >= ?",
+                (max(from_ts, tail_from),),
+            )
+            oldest = (await cursor.fetchone())["oldest"]
+        cursor = await db.execute(
+            "SELECT MAX(timestamp) as newest FROM gas_readings WHERE timestamp >= ? AND timestamp <= ?",
+            (tail_from, to_ts),
+        )
+        newest = (await cursor.fetchone())["newest"]
+        if newest is None and len(archived):
+            newest = int(archived[-1])
+        if newest is None:
+            cursor = await db.execute(
+                "SELECT close_ts FROM gas_candles WHERE interval_s = 3600 AND bucket <= ? "
+                "AND close_ts <= ? ORDER BY bucket DESC LIMIT 1",
+                (to_ts, to_ts),
+            )
+            row = await cursor.fetchone()
+            newest = row and row[0]
+        return {"avg_price": total / count, "count": count, "oldest": oldest, "newest": newest}
+
+
+async def _sum_between(db: aiosqlite.Connection, from_ts: int, to_ts: int) -> tuple[float, int]:
+    # Whole checkpoint buckets inside the window come from two prefix lookups;
+    # only the partial buckets at either edge are scanned from gas_readings.
+    lo = -(-from_ts // PREFIX_BUCKET_S) * PREFIX_BUCKET_S
+    hi = (to_ts + 1) // PREFIX_BUCKET_S * PREFIX_BUCKET_S
+    if hi <= lo:
+        return await _scan_sum(db, from_ts, to_ts)
+    hi_sum, hi_count = await _prefix_before(db, hi)
+    lo_sum, lo_count = await _prefix_before(db, lo)
+    head_sum, head_count = await _scan_sum(db, from_ts, lo - 1)
+    tail_sum, tail_count = await _scan_sum(db, hi, to_ts)
+    return (
+        hi_sum - lo_sum + head_sum + tail_sum,
+        hi_count - lo_count + head_count + tail_count,
+    )
+
+
+async def _prefix_before(db: aiosqlite.Connection, ts: int) -> tuple[float, int]:
+    """Running sum/count of readings with timestamp < ts (ts bucket-aligned)."""
     cursor = await db.execute(
-        "SELECT timestamp, gas_price, source FROM gas_readings ORDER BY timestamp DESC LIMIT 1"
+        "SELECT cum_sum, cum_count FROM gas_prefix_sums "
+        "WHERE bucket < ? ORDER BY bucket DESC LIMIT 1",
+        (ts,),
     )
     row = await cursor.fetchone()
     if row is None:
-        return None
-    return {"timestamp": row["timestamp"], "gas_price": row["gas_price"], "source": row["source"]}
+        return 0.0, 0
+    return row["cum_sum"], row["cum_count"]
 
 
-async def get_readings_since(since_ts: int) -> list[dict]:
-    db = await get_db()
+async def _scan_sum(db: aiosqlite.Connection, from_ts: int, to_ts: int) -> tuple[float, int]:
+    # Compacted stretches are summed from the candles that start inside them,
+    # so they resolve to that tier's bucket size.
+    total, count = 0.0, 0
+    for size, lo, hi in _rollup_spans(from_ts, to_ts):
+        cursor = await db.execute(
+            "SELECT SUM(sum), SUM(count) FROM gas_candles "
+            "WHERE interval_s = ? AND bucket >= ? AND bucket <= ?",
+            (size, lo, hi),
+        )
+        row = await cursor.fetchone()
+        total += row[0] or 0.0
+        count += row[1] or 0
+    price = _archived("standard", from_ts, to_ts)[1]
+    total += float(price.sum())
+    count += len(price)
     cursor = await db.execute(
-        "SELECT timestamp, gas_price, source FROM gas_readings WHERE timestamp >= ? ORDER BY timestamp ASC",
-        (since_ts,),
+        "SELECT SUM(standard) as total, COUNT(*) as cnt FROM gas_readings "
+        "WHERE timestamp >= ? AND timestamp <= ?",
+        (max(from_ts, _tail_from), to_ts),
     )
-    rows = await cursor.fetchall()
-    return [
-        {"timestamp": r["timestamp"], "gas_price": r["gas_price"], "source": r["source"]}
-        for r in rows
-    ]
+    row = await cursor.fetchone()
+    return total + (row["total"] or 0.0), count + row["cnt"]
 
 
-async def get_readings_range(from_ts: int, to_ts: int) -> list[dict]:
-    db = await get_db()
+# The price carried into the window comes from the last reading before it,
+# so any earlier write can change the result.
+@query_cache.cached(window=lambda from_ts, to_ts, source=None, tier="standard": (0, to_ts))
+async def get_twap(
+    from_ts: int, to_ts: int, source: str | None = None, tier: str = "standard"
+) -> dict:
+    """Time-weighted average price over [from_ts, to_ts].
+
+    Each reading's price holds until the next one. The window is clipped to
+    start at the series' first reading; the last price is carried forward to
+    `to_ts`. For the standard tier the cost is two index lookups regardless
+    of window length; other tiers integrate the readings in the window.
+    """
+    async with _reader() as db:
+        return await _twap_for_tier(db, tier, source, from_ts, to_ts)
+
+
+async def get_twaps(
+    windows: list[tuple[int, int]], source: str | None = None, tier: str = "standard"
+) -> list[dict]:
+    """Batch form of get_twap — e.g. pricing every contract expiry at once."""
+    async with _reader() as db:
+        return [await _twap_for_tier(db, tier, source, f, t) for f, t in windows]
+
+
+async def _twap_for_tier(
+    db: aiosqlite.Connection, tier: str, source: str | None, from_ts: int, to_ts: int
+) -> dict:
+    col = _tier_column(tier)
+    if col == "standard":
+        return await _twap(db, source or TWAP_ALL_SOURCES, from_ts, to_ts)
+    return await _scan_twap(db, col, source, from_ts, to_ts)
+
+
+async def _twap(db: aiosqlite.Connection, series: str, from_ts: int, to_ts: int) -> dict:
+    empty = {"twap": 0.0, "from": from_ts, "to": to_ts, "effective_from": 0}
+    if to_ts <= from_ts:
+        return empty
     cursor = await db.execute(
-        "SELECT timestamp, gas_price, source FROM gas_readings "
-        "WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp ASC",
-        (from_ts, to_ts),
+        "SELECT MIN(timestamp) as first FROM gas_twap_points WHERE series = ?",
+        (series,),
     )
-    rows = await cursor.fetchall()
+    first = (await cursor.fetchone())["first"]
+    if first is None or first >= to_ts:
+        return empty
+    start = max(from_ts, first)
+    integral = await _integral_at(db, series, to_ts) - await _integral_at(db, series, start)
+    return {"twap": integral / (to_ts - start), "from": from_ts, "to": to_ts, "effective_from": start}
+
+
+async def _integral_at(db: aiosqlite.Connection, series: str, ts: int) -> float:
+    cursor = await db.execute(
+        "SELECT timestamp, price, cum_integral FROM gas_twap_points "
+        "WHERE series = ? AND timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+        (series, ts),
+    )
+    row = await cursor.fetchone()
+    return row["cum_integral"] + row["price"] * (ts - row["timestamp"])
+
+
+async def _scan_twap(
+    db: aiosqlite.Connection, col: str, source: str | None, from_ts: int, to_ts: int
+) -> dict:
+    """TWAP of a non-rollup tier, integrated from the raw readings (archived
+    ones first, then the SQLite tail)."""
+    empty = {"twap": 0.0, "from": from_ts, "to": to_ts, "effective_from": 0}
+    if to_ts <= from_ts:
+        return empty
+    source_id = None if source is None else SOURCES.get(source, -1)
+    where = f"{col} IS NOT NULL AND timestamp >= {_tail_from}" + (
+        "" if source is None else f" AND source = {source_id}"
+    )
+    sealed_ts, sealed_price, _ = _archived(col, 0, to_ts - 1, source_id)
+    if len(sealed_ts):
+        first = int(sealed_ts[0])
+    else:
+        cursor = await db.execute(f"SELECT MIN(timestamp) as first FROM gas_readings WHERE {where}")
+        first = (await cursor.fetchone())["first"]
+    if first is None or first >= to_ts:
+        return empty
+    start = max(from_ts, first)
+    # Price in force at `start`, then every change up to `to_ts`. Same-second
+    # readings resolve to the highest source id, as in rebuild_twap_points.
+    i = int(np.searchsorted(sealed_ts, start, "right"))
+    price = float(sealed_price[i - 1]) if i else None
+    cursor = await db.execute(
+        f"SELECT {col} AS price FROM gas_readings WHERE {where} AND timestamp <= ? "
+        "ORDER BY timestamp DESC, source DESC LIMIT 1",
+        (start,),
+    )
+    row = await cursor.fetchone()
+    if row is not None:
+        price = row["price"]
+    changes = dict(zip(sealed_ts[i:].tolist(), sealed_price[i:].tolist()))
+    cursor = await db.execute(
+        f"SELECT timestamp, {col} AS price FROM gas_readings "
+        f"WHERE {where} AND timestamp > ? AND timestamp < ? ORDER BY timestamp, source",
+        (start, to_ts),
+    )
+    for r in await cursor.fetchall():
+        changes[r["timestamp"]] = r["price"]
+    integral, prev = 0.0, start
+    for ts, next_price in changes.items():
+        integral += price * (ts - prev)
+        price, prev = next_price, ts
+    integral += price * (to_ts - prev)
+    return {"twap": integral / (to_ts - start), "from": from_ts, "to": to_ts, "effective_from": start}
+
+
+async def count_readings() -> int:
+    cached = hot_window.count()
+    if cached is not None:
+        return cached
+    async with _reader() as db:
+        return await _count_readings(db)
+
+
+async def _count_readings(db: aiosqlite.Connection) -> int:
+    """Raw readings still served: the archive plus the SQLite tail."""
+    sealed = archive.count(archive.start, _archive_until - 1)
+    cursor = await db.execute(
+        "SELECT COUNT(*) as cnt FROM gas_readings WHERE timestamp >= ?", (_tail_from,)
+    )
+    return sealed + (await cursor.fetchone())["cnt"]
+
+
+@query_cache.cached(
+    # Edge candles cover whole buckets, which can reach past either end.
+    window=lambda interval, from_ts, to_ts, tier="standard": (
+        from_ts - from_ts % CANDLE_INTERVALS[interval],
+        to_ts - to_ts % CANDLE_INTERVALS[interval] + CANDLE_INTERVALS[interval] - 1,
+    )
+)
+async def get_candles(interval: str, from_ts: int, to_ts: int, tier: str = "standard") -> list[dict]:
+    async with _reader() as db:
+        rows = await _candle_rows(db, interval, from_ts, to_ts, tier)
     return [
-        {"timestamp": r["timestamp"], "gas_price": r["gas_price"], "source": r["source"]}
-        for r in rows
+        {
+            "timestamp": bucket,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "count": count,
+            "mean": total / count,
+        }
+        for bucket, open_, high, low, close, count, total in rows
     ]
 
 
-async def get_average_since(since_ts: int) -> dict:
+async def get_candle_columns(
+    interval: str, from_ts: int, to_ts: int, tier: str = "standard"
+) -> dict[str, list]:
+    """get_candles as parallel lists keyed by field, for columnar responses."""
+    async with _reader() as db:
+        rows = await _candle_rows(db, interval, from_ts, to_ts, tier)
+    bucket, open_, high, low, close, count, total = map(list, zip(*rows)) if rows else [[]] * 7
+    return {
+        "timestamp": bucket,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "count": count,
+        "mean": [t / c for t, c in zip(total, count)],
+    }
+
+
+async def _candle_rows(
+    db: aiosqlite.Connection, interval: str, from_ts: int, to_ts: int, tier: str
+) -> list[tuple]:
+    """(bucket, open, high, low, close, count, sum) tuples, oldest first."""
+    size = CANDLE_INTERVALS[interval]
+    col = _tier_column(tier)
+    if col == "standard":
+        cursor = await db.execute(
+            "SELECT bucket, open, high, low, close, count, sum FROM gas_candles "
+            "WHERE interval_s = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket ASC",
+            (size, from_ts - from_ts % size, to_ts),
+        )
+    else:
+        # No rollup for the other tiers: aggregate the covered buckets
+        # with the same windowing rebuild_candles uses.
+        cursor = await db.execute(
+            f"""
+            SELECT bucket, first AS open, MAX(p) AS high, MIN(p) AS low, last AS close,
+                   COUNT(*) AS count, SUM(p) AS sum
+            FROM (
+                SELECT {col} AS p, timestamp - timestamp % :size AS bucket,
+                       FIRST_VALUE({col}) OVER w AS first,
+                       LAST_VALUE({col})  OVER w AS last
+                FROM gas_readings
+                WHERE timestamp >= :lo AND timestamp <= :hi AND {col} IS NOT NULL
+                WINDOW w AS (
+                    PARTITION BY timestamp - timestamp % :size
+                    ORDER BY timestamp, source
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                )
+            )
+            GROUP BY bucket ORDER BY bucket ASC
+            """,
+            {"size": size, "lo": from_ts - from_ts % size, "hi": to_ts - to_ts % size + size - 1},
+        )
+    cursor.row_factory = None
+    return await cursor.fetchall()
+
+
+# ---------------------------------------------------------------------------
+# Retention and compaction
+# ---------------------------------------------------------------------------
+_compaction_stats = {
+    "readings_archived": 0,
+    "readings_deleted": 0,
+    "candles_deleted": 0,
+    "twap_points_removed": 0,
+}
+_vacuum_warned = False
+
+
+async def _load_watermarks(db: aiosqlite.Connection) -> None:
+    global _raw_from, _fine_from, _archive_until, _tail_from, _raw_start
+    cursor = await db.execute(
+        "SELECT key, value FROM db_meta WHERE key IN ('raw_from', 'fine_from', 'archive_until')"
+    )
+    meta = {r[0]: int(r[1]) for r in await cursor.fetchall()}
+    archive.load()
+    sealed = meta.get("archive_until", 0)
+    if sealed > archive.end:
+        log.error(
+            "Archive at %s ends at %d but days up to %d were sealed into it; they are missing",
+            settings.archive_dir, archive.end, sealed,
+        )
+    _raw_from = meta.get("raw_from", 0)
+    _fine_from = meta.get("fine_from", 0)
+    # A day appended to the archive but not yet committed here stays unread.
+    _archive_until = min(sealed, archive.end)
+    if _archive_until > archive.start:
+        _raw_start = min(_raw_from, archive.start)
+        _tail_from = max(_raw_from, _archive_until)
+    else:
+        _raw_start = _tail_from = _raw_from
+
+
+async def _get_meta(db: aiosqlite.Connection, key: str) -> int:
+    cursor = await db.execute("SELECT value FROM db_meta WHERE key = ?", (key,))
+    row = await cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def _set_meta(db: aiosqlite.Connection, key: str, value: int) -> None:
+    await db.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _retention_cutoffs(now: int) -> tuple[int, int]:
+    """Hour-aligned (raw, fine) cutoffs for `now`; 0 keeps that tier forever.
+
+    Raw readings are never dropped inside the hot window, and 5-minute
+    candles never before the raw readings they summarise.
+    """
+    raw_days = settings.retention_raw_days
+    if raw_days:
+        raw_days = max(raw_days, settings.hot_window_days)
+    fine_days = settings.retention_5m_days
+    if fine_days and raw_days:
+        fine_days = max(fine_days, raw_days)
+    elif fine_days:
+        fine_days = 0  # raw kept forever, so nothing needs the 5m tier
+    hour = PREFIX_BUCKET_S
+    raw = (now - raw_days * 86400) // hour * hour if raw_days else 0
+    fine = (now - fine_days * 86400) // hour * hour if fine_days else 0
+    return raw, fine
+
+
+async def _compaction_batch(work) -> bool:
+    """Run one compaction step in its own write transaction.
+
+    `work(db)` returns the (from_ts, to_ts) range it changed, or None when
+    there is nothing left. The range goes into the write log so every
+    worker drops what it derived from it. Returns whether work was done.
+    """
     db = await get_db()
+    async with _write_lock:
+        try:
+            changed = await work(db)
+            if changed is None:
+                await db.rollback()
+                return False
+            cursor = await db.execute(
+                "INSERT INTO gas_write_log (from_ts, to_ts, readings) VALUES (?, ?, NULL)", changed
+            )
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    _note_write([(changed[0],), (changed[1],)], cursor.lastrowid)
+    # Let queued live writes and readers in between batches.
+    await asyncio.sleep(0)
+    return True
+
+
+async def _delete_readings(db: aiosqlite.Connection) -> tuple[int, int] | None:
+    """Delete SQLite rows no longer read: expired ones, and sealed ones now
+    served from the archive."""
+    cursor = await db.execute(
+        "SELECT MIN(timestamp) FROM gas_readings WHERE timestamp < ?", (_tail_from,)
+    )
+    lo = (await cursor.fetchone())[0]
+    if lo is None:
+        return None
+    cursor = await db.execute(
+        "SELECT timestamp FROM gas_readings WHERE timestamp < ? ORDER BY timestamp LIMIT 1 OFFSET ?",
+        (_tail_from, settings.compaction_batch_rows),
+    )
+    row = await cursor.fetchone()
+    end = row[0] if row else _tail_from
+    cursor = await db.execute("DELETE FROM gas_readings WHERE timestamp < ?", (end,))
+    _compaction_stats["readings_deleted"] += cursor.rowcount
+    # 1-minute candles follow the raw readings' retention, archived or not.
+    cursor = await db.execute(
+        "DELETE FROM gas_candles WHERE interval_s = 60 AND bucket <= ?", (min(end, _raw_from) - 60,)
+    )
+    _compaction_stats["candles_deleted"] += cursor.rowcount
+    return lo, end - 1
+
+
+async def _delete_fine_candles(db: aiosqlite.Connection) -> tuple[int, int] | None:
+    cursor = await db.execute(
+        "SELECT bucket FROM gas_candles WHERE interval_s = 300 AND bucket < ? "
+        "ORDER BY bucket LIMIT 1 OFFSET ?",
+        (_fine_from, settings.compaction_batch_rows),
+    )
+    row = await cursor.fetchone()
+    end = row[0] if row else _fine_from
+    cursor = await db.execute(
+        "DELETE FROM gas_candles WHERE interval_s = 300 AND bucket < ?", (end,)
+    )
+    if not cursor.rowcount:
+        return None
+    _compaction_stats["candles_deleted"] += cursor.rowcount
+    return 0, end - 1
+
+
+def _thin_series(
+    points: list, prev, nxt, width: int
+) -> list[tuple[int, float, float]]:
+    """Collapse a run of TWAP points to one per `width`-second bucket.
+
+    Each bucket becomes a single point at its start carrying the bucket's
+    time-weighted mean, so the integral stays exact at every bucket
+    boundary. Where the next point is not at the following boundary, a
+    point carrying the bucket's closing price is added there so the gap
+    keeps its original price. A bucket holding a single point is left as
+    it is; collapsing it would not remove anything.
+    """
+    groups: dict[int, list] = {}
+    for p in points:
+        groups.setdefault(p[0] // width * width, []).append(p)
+    buckets = sorted(groups)
+    # Where each bucket's output begins: its start, or its only point.
+    firsts = [groups[b][0][0] if len(groups[b]) == 1 else b for b in buckets]
+    out = []
+    for i, b in enumerate(buckets):
+        group = groups[b]
+        last = group[-1]
+        if len(group) == 1:
+            out.append(last)
+            prev = last
+            continue
+        if prev is None:
+            # The series starts inside this bucket.
+            start, cum = group[0][0], group[0][2]
+        else:
+            start, cum = b, prev[2] + prev[1] * (b - prev[0])
+        end = b + width
+        end_cum = last[2] + last[1] * (end - last[0])
+        mean = (end_cum - cum) / (end - start)
+        out.append((start, mean, cum))
+        following = firsts[i + 1] if i + 1 < len(buckets) else (nxt[0] if nxt else None)
+        if following != end and last[1] != mean:
+            out.append((end, last[1], end_cum))
+        prev = last
+    return out
+
+
+async def _thin_twap(db: aiosqlite.Connection, key: str, width: int, stop: int) -> tuple[int, int] | None:
+    """Thin every TWAP series over the next batch of [progress, stop)."""
+    lo = await _get_meta(db, key)
+    if lo >= stop:
+        return None
     cursor = await db.execute(
-        "SELECT AVG(gas_price) as avg_price, COUNT(*) as cnt, "
-        "MIN(timestamp) as oldest, MAX(timestamp) as newest "
-        "FROM gas_readings WHERE timestamp >= ?",
-        (since_ts,),
+        "SELECT timestamp FROM gas_twap_points WHERE series = ? AND timestamp >= ? AND timestamp < ? "
+        "ORDER BY timestamp LIMIT 1 OFFSET ?",
+        (TWAP_ALL_SOURCES, lo, stop, settings.compaction_batch_rows),
     )
     row = await cursor.fetchone()
+    end = stop if row is None else max(lo + width, row[0] // width * width)
+    cursor = await db.execute("SELECT DISTINCT series FROM gas_twap_points")
+    for (series,) in await cursor.fetchall():
+        cursor = await db.execute(
+            "SELECT timestamp, price, cum_integral FROM gas_twap_points "
+            "WHERE series = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (series, lo, end),
+        )
+        points = [tuple(r) for r in await cursor.fetchall()]
+        if not points:
+            continue
+        cursor = await db.execute(
+            "SELECT timestamp, price, cum_integral FROM gas_twap_points "
+            "WHERE series = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1",
+            (series, lo),
+        )
+        prev = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT timestamp FROM gas_twap_points WHERE series = ? AND timestamp >= ? "
+            "ORDER BY timestamp LIMIT 1",
+            (series, end),
+        )
+        nxt = await cursor.fetchone()
+        thinned = _thin_series(points, prev and tuple(prev), nxt and tuple(nxt), width)
+        await db.execute(
+            "DELETE FROM gas_twap_points WHERE series = ? AND timestamp >= ? AND timestamp < ?",
+            (series, lo, end),
+        )
+        await db.executemany(
+            "INSERT OR REPLACE INTO gas_twap_points (series, timestamp, price, cum_integral) "
+            "VALUES (?, ?, ?, ?)",
+            [(series, *p) for p in thinned],
+        )
+        _compaction_stats["twap_points_removed"] += len(points) - len(thinned)
+    await _set_meta(db, key, end)
+    return lo, end - 1
+
+
+async def _advance_watermarks(raw: int, fine: int) -> None:
+    """Move reads for windows before the new cutoffs onto the rollups.
+
+    Done (and logged) before anything is deleted, so no query ever sees a
+    tier part-way through compaction.
+    """
+    async def work(db: aiosqlite.Connection) -> tuple[int, int] | None:
+        if raw <= _raw_from and fine <= _fine_from:
+            return None
+        await _set_meta(db, "raw_from", max(raw, _raw_from))
+        await _set_meta(db, "fine_from", max(fine, _fine_from))
+        return 0, max(raw, fine) - 1
+
+    if await _compaction_batch(work):
+        await _load_watermarks(await get_db())
+
+
+async def _seal_day(db: aiosqlite.Connection, stop: int) -> tuple[int, int] | None:
+    """Append the next closed day before `stop` to the archive and commit
+    it as sealed."""
+    lo = _archive_until
+    if archive.end <= _archive_until:
+        if _archive_until:
+            day = start = _archive_until
+        else:
+            cursor = await db.execute(
+                "SELECT MIN(timestamp) FROM gas_readings WHERE timestamp >= ?", (_raw_from,)
+            )
+            first = (await cursor.fetchone())[0]
+            if first is None:
+                return None
+            day = first // ARCHIVE_DAY * ARCHIVE_DAY
+            start = lo = max(day, _raw_from)
+        if day + ARCHIVE_DAY > stop:
+            return None
+        cursor = await db.execute(
+            f"SELECT {', '.join(_ARCHIVE_COLUMNS)} FROM gas_readings "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, source",
+            (start, day + ARCHIVE_DAY),
+        )
+        cursor.row_factory = None
+        rows = await cursor.fetchall()
+        columns = dict(zip(_ARCHIVE_COLUMNS, zip(*rows) if rows else ([],) * len(_ARCHIVE_COLUMNS)))
+        await asyncio.to_thread(archive.append_day, day, columns, start)
+        _compaction_stats["readings_archived"] += len(rows)
+    # Otherwise a previous pass appended but died before this commit; the
+    # rows are still in SQLite, so it only needs committing.
+    await _set_meta(db, "archive_until", archive.end)
+    return lo, archive.end - 1
+
+
+async def seal_archive() -> None:
+    """Move closed days from gas_readings into the columnar archive.
+
+    A day is sealed once it is `archive_seal_after_days` old (never inside
+    the hot window), oldest first and one day per transaction. The day is
+    appended to the archive files, then `archive_until` is committed, which
+    moves every worker's reads of it to the archive; the SQLite rows, no
+    longer read, are deleted by the next compaction batch. A reading that
+    arrives for a day after it was sealed still reaches the rollups but
+    not the archive.
+    """
+    if not settings.archive_seal_after_days:
+        return
+    lag = max(settings.archive_seal_after_days, settings.hot_window_days) * ARCHIVE_DAY
+    stop = (int(time.time()) - lag) // ARCHIVE_DAY * ARCHIVE_DAY
+    sealed = _archive_until
+    while await _compaction_batch(lambda db: _seal_day(db, stop)):
+        await _load_watermarks(await get_db())
+    if _archive_until > sealed:
+        log.info("Sealed archive through %d (%d rows)", _archive_until, archive.rows)
+
+
+async def compact() -> None:
+    """Apply the retention tiers, one small transaction at a time.
+
+    Closed days are first sealed into the archive (see seal_archive).
+    Raw readings (and 1-minute candles) older than `retention_raw_days`
+    are deleted and the TWAP series over that span thinned to 5-minute
+    buckets; 5-minute candles older than `retention_5m_days` are deleted
+    and the TWAP series thinned to hourly buckets. TWAP points over sealed
+    days are left at full resolution. Hourly and daily
+    candles and the prefix sums are kept forever. Each batch commits on
+    its own and releases the write lock, so live writes and API reads
+    never wait behind a whole pass. Freed pages are then returned with
+    incremental vacuum and the WAL checkpointed.
+    """
+    await seal_archive()
+    raw, fine = _retention_cutoffs(int(time.time()))
+    await _advance_watermarks(raw, fine)
+    deleted = _compaction_stats["readings_deleted"]
+    if _tail_from:
+        while await _compaction_batch(_delete_readings):
+            pass
+    # TWAP points over sealed days are never thinned: their readings are
+    # all kept in the archive, and a settled TWAP must not move afterwards.
+    fine_stop, coarse_stop = _raw_from, _fine_from
+    if _archive_until > archive.start:
+        fine_stop, coarse_stop = min(fine_stop, archive.start), min(coarse_stop, archive.start)
+    if _raw_from:
+        while await _compaction_batch(
+            lambda db: _thin_twap(db, "twap_fine_until", 300, fine_stop)
+        ):
+            pass
+    if _fine_from:
+        while await _compaction_batch(_delete_fine_candles):
+            pass
+        while await _compaction_batch(
+            lambda db: _thin_twap(db, "twap_coarse_until", 3600, coarse_stop)
+        ):
+            pass
+    if _compaction_stats["readings_deleted"] > deleted:
+        await load_hot_window()
+    await _incremental_vacuum()
+
+
+async def _incremental_vacuum() -> None:
+    global _vacuum_warned
+    db = await get_db()
+    cursor = await db.execute("PRAGMA auto_vacuum")
+    if (await cursor.fetchone())[0] != 2:
+        if not _vacuum_warned:
+            log.warning(
+                "auto_vacuum is not INCREMENTAL on this database; compacted space is "
+                "reused but not returned until a one-off VACUUM"
+            )
+            _vacuum_warned = True
+    else:
+        while True:
+            async with _write_lock:
+                cursor = await db.execute("PRAGMA freelist_count")
+                if not (await cursor.fetchone())[0]:
+                    break
+                await db.execute(f"PRAGMA incremental_vacuum({settings.compaction_vacuum_pages})")
+            await asyncio.sleep(0)
+    async with _write_lock:
+        cursor = await db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        busy, log_pages, checkpointed = await cursor.fetchone()
+    log.info(
+        "Compaction: raw from %d, 5m from %d; %s; WAL checkpointed %d/%d pages",
+        _raw_from, _fine_from, _compaction_stats, checkpointed, log_pages,
+    )
+
+
+def retention_stats() -> dict:
     return {
-        "avg_price": row["avg_price"] or 0.0,
-        "count": row["cnt"],
-        "oldest": row["oldest"] or 0,
-        "newest": row["newest"] or 0,
+        "raw_from": _raw_from,
+        "rollup_5m_from": _fine_from,
+        "archived_until": _archive_until,
+        **_compaction_stats,
     }
 
 
-async def count_readings() -> int:
+async def run_maintenance() -> None:
+    """Periodic upkeep: prune the write log, refresh planner statistics and
+    checkpoint the WAL."""
     db = await get_db()
-    cursor = await db.execute("SELECT COUNT(*) as cnt FROM gas_readings")
-    row = await cursor.fetchone()
-    return row["cnt"]
+    async with _write_lock:
+        await db.execute(
+            "DELETE FROM gas_write_log WHERE seq <= (SELECT MAX(seq) FROM gas_write_log) - ?",
+            (settings.write_log_keep_entries,),
+        )
+        await db.commit()
+        await db.execute("PRAGMA optimize")
+        cursor = await db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        busy, log_pages, checkpointed = await cursor.fetchone()
+    log.info("Maintenance: WAL checkpointed %d/%d pages", checkpointed, log_pages)
+
+
+# ---------------------------------------------------------------------------
+# FDC attestation jobs
+# ---------------------------------------------------------------------------
+ATTESTATION_OPEN_STATES = ("prepared", "submitted", "finalized", "proved")
+
+
+async def create_attestation(abi_encoded_request: str) -> int:
+    db = await get_db()
+    now = int(time.time())
+    async with _write_lock:
+        cursor = await db.execute(
+            "INSERT INTO attestations (state, abi_encoded_request, created_at, updated_at) "
+            "VALUES ('prepared', ?, ?, ?)",
+            (abi_encoded_request, now, now),
+        )
+        await db.commit()
+    return cursor.lastrowid
+
+
+async def update_attestation(job_id: int, **fields) -> None:
+    db = await get_db()
+    fields["updated_at"] = int(time.time())
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    async with _write_lock:
+        await db.execute(
+            f"UPDATE attestations SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id),
+        )
+        await db.commit()
+
+
+async def get_attestation(job_id: int) -> dict | None:
+    async with _reader() as db:
+        cursor = await db.execute("SELECT * FROM attestations WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def get_open_attestations() -> list[dict]:
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"SELECT * FROM attestations WHERE state IN ({', '.join('?' * len(ATTESTATION_OPEN_STATES))}) "
+            "ORDER BY id ASC",
+            ATTESTATION_OPEN_STATES,
+        )
+        return [dict(r) for r in await cursor.fetchall()]
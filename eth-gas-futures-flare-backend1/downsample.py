@@ -0,0 +1,154 @@
+"""
+Min/max-preserving downsampling for /gas/history?max_points=N.
+
+The range is cut into equal time buckets and each bucket keeps its lowest
+and highest reading, in time order. Unlike an average or a single
+representative point per bucket, this keeps every spike and dip visible
+at any zoom level. Bucketing is vectorised with NumPy.
+
+Long ranges are served from a pyramid of pre-downsampled levels: level k
+uses buckets of BASE_WIDTH_S * 2**k seconds, aligned to absolute time and
+cached in chunks of CHUNK_BUCKETS buckets. Level 0 chunks are built from
+raw readings and level k chunks from two level k-1 chunks (the min/max of
+min/maxes is exact), so a request costs about max_points whatever its
+span. A write drops the chunks covering its timestamps.
+"""
+
+import logging
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+import db
+from config import settings
+
+log = logging.getLogger("flarerisk.downsample")
+
+BASE_WIDTH_S = 60
+CHUNK_BUCKETS = 512
+MAX_LEVEL = 16
+
+# (timestamps, prices, source ids)
+Series = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def minmax_indices(ts: np.ndarray, price: np.ndarray, width: int) -> np.ndarray:
+    """Sorted indices of the min and max reading in each `width`-second bucket.
+
+    `ts` must be sorted ascending.
+    """
+    if len(ts) == 0:
+        return np.empty(0, dtype=np.intp)
+    bucket = ts // width
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    # Sorted by bucket, then price: each bucket's first entry is its min and
+    # its last entry its max.
+    order = np.lexsort((price, bucket))
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def _take(series: Series, idx: np.ndarray) -> Series:
+    return series[0][idx], series[1][idx], series[2][idx]
+
+
+def _empty() -> Series:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.uint8)
+
+
+async def _raw(from_ts: int, to_ts: int, tier: str) -> Series:
+    ts, price, source = await db.get_reading_columns(from_ts, to_ts, tier)
+    return (
+        np.asarray(ts, dtype=np.int64),
+        np.asarray(price, dtype=np.float64),
+        np.asarray(source, dtype=np.uint8),
+    )
+
+
+class Downsampler:
+    def __init__(self, max_chunks: int) -> None:
+        self.max_chunks = max_chunks
+        self._chunks: OrderedDict[tuple[str, int, int], Series] = OrderedDict()
+        # Bumped by every invalidation; a chunk computed across a bump may
+        # include pre-write data and is not stored.
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        db.on_write(self.invalidate)
+
+    def invalidate(self, from_ts: int, to_ts: int) -> None:
+        self._epoch += 1
+        for key in list(self._chunks):
+            _, level, chunk = key
+            span = BASE_WIDTH_S * 2**level * CHUNK_BUCKETS
+            if chunk * span <= to_ts and from_ts < (chunk + 1) * span:
+                del self._chunks[key]
+
+    async def _chunk(self, tier: str, level: int, chunk: int) -> Series:
+        key = (tier, level, chunk)
+        cached = self._chunks.get(key)
+        if cached is not None:
+            self._chunks.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        epoch = self._epoch
+        width = BASE_WIDTH_S * 2**level
+        start = chunk * width * CHUNK_BUCKETS
+        end = start + width * CHUNK_BUCKETS - 1
+        if level == 0:
+            series = await _raw(start, end, tier)
+        elif not await db.has_readings(start, end):
+            # Skip building an empty subtree one level-0 chunk at a time.
+            series = _empty()
+        else:
+            lo = await self._chunk(tier, level - 1, 2 * chunk)
+            hi = await self._chunk(tier, level - 1, 2 * chunk + 1)
+            series = tuple(np.concatenate(pair) for pair in zip(lo, hi))
+        series = _take(series, minmax_indices(series[0], series[1], width))
+        if epoch == self._epoch:
+            self._chunks[key] = series
+            if len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+        return series
+
+    async def get(self, from_ts: int, to_ts: int, max_points: int, tier: str = "standard") -> Series:
+        """At most `max_points` readings from [from_ts, to_ts], min/max preserved."""
+        if to_ts < from_ts:
+            return _empty()
+        # Each bucket yields up to 2 points, plus 2 partial buckets at the edges.
+        width = 2 * (to_ts - from_ts + 1) / max(1, max_points - 4)
+        if width <= BASE_WIDTH_S:
+            raw = await _raw(from_ts, to_ts, tier)
+            if len(raw[0]) <= max_points:
+                return raw
+            return _take(raw, minmax_indices(raw[0], raw[1], math.ceil(width)))
+        level = min(MAX_LEVEL, math.ceil(math.log2(width / BASE_WIDTH_S)))
+        bucket_w = BASE_WIDTH_S * 2**level
+        # Whole buckets come from the cached pyramid; the partial buckets at
+        # either edge are reduced from raw readings so their extremes are
+        # clipped to the requested range.
+        first = -(-from_ts // bucket_w) * bucket_w
+        last = (to_ts + 1) // bucket_w * bucket_w
+        span = bucket_w * CHUNK_BUCKETS
+        parts = [await self._edge(from_ts, first - 1, bucket_w, tier)]
+        for chunk in range(first // span, (last - 1) // span + 1):
+            ts, price, source = await self._chunk(tier, level, chunk)
+            keep = (ts >= first) & (ts < last)
+            parts.append((ts[keep], price[keep], source[keep]))
+        parts.append(await self._edge(last, to_ts, bucket_w, tier))
+        return tuple(np.concatenate(col) for col in zip(*parts))
+
+    async def _edge(self, from_ts: int, to_ts: int, width: int, tier: str) -> Series:
+        if to_ts < from_ts:
+            return _empty()
+        raw = await _raw(from_ts, to_ts, tier)
+        return _take(raw, minmax_indices(raw[0], raw[1], width))
+
+    def stats(self) -> dict:
+        return {"chunks": len(self._chunks), "hits": self.hits, "misses": self.misses}
+
+
+# Singleton
+downsampler = Downsampler(settings.downsample_cache_chunks)
@@ -7,18 +7,26 @@ Flow:
 3. Wait for voting round to finalize (~90-180s)
 4. Retrieve proof from DA layer
 5. Decode ABI-encoded gas price data from the attested response
+
+Each cycle is an attestation job persisted in the `attestations` table, so
+several can be in flight at once (one per voting round) and a restart
+resumes them where they left off instead of losing the fee already paid.
 """
 
 import asyncio
+import json
 import logging
 import time
+from collections import deque
+from collections.abc import Awaitable, Callable
 
-import aiohttp
-from eth_abi import decode as abi_decode
 from web3 import AsyncHTTPProvider, AsyncWeb3
+from web3.exceptions import TransactionNotFound
 from web3.middleware import ExtraDataToPOAMiddleware
 
+import db
 from config import settings
+from http_client import http_client
 
 log = logging.getLogger("flarerisk.fdc")
 
@@ -59,6 +67,16 @@ ABI_SIGNATURE = (
     '], "name": "gasData", "type": "tuple"}'
 )
 
+# Finalization watch: start polling Relay.isFinalized this many seconds before
+# the expected finalization time, then poll roughly once per Flare block.
+FINALIZATION_LEAD_S = 15
+FINALIZATION_POLL_S = 2.0
+
+# DA layer proof polling: start immediately, back off geometrically.
+DA_POLL_INITIAL_S = 1.0
+DA_POLL_MAX_S = 15.0
+DA_POLL_BACKOFF = 1.5
+
 # ---------------------------------------------------------------------------
 # Minimal contract ABIs
 # ---------------------------------------------------------------------------
@@ -124,6 +142,136 @@ RELAY_ABI = [
 ]
 
 
+# ---------------------------------------------------------------------------
+# IWeb2Json.Response decoder
+# ---------------------------------------------------------------------------
+#
+# struct Response {
+#     bytes32 attestationType;      // head word 0
+#     bytes32 sourceId;             // head word 1
+#     uint64 votingRound;           // head word 2
+#     uint64 lowestUsedTimestamp;   // head word 3
+#     RequestBody requestBody;      // head word 4: offset (7 dynamic strings, url first)
+#     ResponseBody responseBody;    // head word 5: offset -> (bytes abiEncodedData)
+# }
+#
+# abiEncodedData is our static (uint256 rapid, fast, standard, slow) tuple.
+# Offsets are followed directly, so decoding is a handful of slices with no
+# trial decoding.
+
+_RESPONSE_HEAD_WORDS = 6
+_ATTESTATION_TYPE_WORD = bytes.fromhex(ATTESTATION_TYPE_HEX[2:])
+_GAS_TIERS = ("rapid_gas_price", "fast_gas_price", "propose_gas_price", "safe_gas_price")
+
+
+def _word(raw: bytes, pos: int) -> int:
+    if pos < 0 or pos + 32 > len(raw):
+        raise ValueError(f"ABI word at {pos} out of bounds ({len(raw)} bytes)")
+    return int.from_bytes(raw[pos:pos + 32], "big")
+
+
+def _dynamic_bytes(raw: bytes, pos: int) -> bytes:
+    length = _word(raw, pos)
+    if pos + 32 + length > len(raw):
+        raise ValueError(f"ABI bytes at {pos} overrun ({length} bytes)")
+    return raw[pos + 32:pos + 32 + length]
+
+
+def decode_web2json_response(response_hex: str | bytes) -> dict:
+    """Decode an ABI-encoded IWeb2Json.Response into gas tiers (gwei),
+    the attested URL, its timestamp and voting round.
+
+    Accepts both the DA layer's raw form (the struct wrapped as a single
+    dynamic tuple, i.e. a leading 0x20 offset word) and the bare struct.
+    """
+    if isinstance(response_hex, str):
+        raw = bytes.fromhex(response_hex[2:] if response_hex.startswith("0x") else response_hex)
+    else:
+        raw = response_hex
+
+    base = 0 if raw[:32] == _ATTESTATION_TYPE_WORD else _word(raw, 0)
+    if base + 32 * _RESPONSE_HEAD_WORDS > len(raw):
+        raise ValueError("Response too short for IWeb2Json.Response head")
+
+    voting_round = _word(raw, base + 64)
+    timestamp = _word(raw, base + 96)
+    request_body = base + _word(raw, base + 128)
+    response_body = base + _word(raw, base + 160)
+
+    url = _dynamic_bytes(raw, request_body + _word(raw, request_body)).decode()
+    data = _dynamic_bytes(raw, response_body + _word(raw, response_body))
+    if len(data) != 128:
+        raise ValueError(f"abiEncodedData is {len(data)} bytes, expected 4 uint256 words")
+
+    result = {
+        tier: int.from_bytes(data[i * 32:(i + 1) * 32], "big") / 1e9
+        for i, tier in enumerate(_GAS_TIERS)
+    }
+    result.update(url=url, timestamp=timestamp, voting_round=voting_round)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Per-stage latency
+# ---------------------------------------------------------------------------
+
+class StageLatency:
+    """Recent durations (seconds) of each attestation stage."""
+
+    def __init__(self, maxlen: int = 100) -> None:
+        self._samples: dict[str, deque[float]] = {}
+        self._maxlen = maxlen
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._samples.setdefault(stage, deque(maxlen=self._maxlen)).append(seconds)
+
+    def stats(self) -> dict[str, dict]:
+        out = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            out[stage] = {
+                "count": len(ordered),
+                "last_s": round(samples[-1], 2),
+                "p50_s": round(ordered[len(ordered) // 2], 2),
+                "p95_s": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+            }
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Nonce manager
+# ---------------------------------------------------------------------------
+
+class NonceManager:
+    """Hands out sequential nonces locally so several submissions can be
+    signed back to back without waiting for each to be mined."""
+
+    def __init__(self, w3: AsyncWeb3, address: str) -> None:
+        self._w3 = w3
+        self._address = address
+        self._next: int | None = None
+        self._lock = asyncio.Lock()
+
+    async def _sync(self) -> None:
+        if self._next is None:
+            self._next = await self._w3.eth.get_transaction_count(self._address, "pending")
+
+    async def prime(self) -> None:
+        async with self._lock:
+            await self._sync()
+
+    async def next(self) -> int:
+        async with self._lock:
+            await self._sync()
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def reset(self) -> None:
+        """Resync from the chain on the next call (after a failed send)."""
+        self._next = None
+
+
 # ---------------------------------------------------------------------------
 # FDC Client
 # ---------------------------------------------------------------------------
@@ -132,10 +280,21 @@ class FDCClient:
     def __init__(self) -> None:
         self._w3: AsyncWeb3 | None = None
         self._account = None
+        self._nonces: NonceManager | None = None
         self._fdc_hub = None
         self._relay = None
         self._systems_manager = None
         self._fdc_fee = None
+        # Immutable chain metadata, read once in connect()
+        self._chain_id: int | None = None
+        self._first_round_ts: int | None = None
+        self._epoch_seconds: int | None = None
+        # Seconds from round end to Relay finalization; refined from observations.
+        self._finalization_lag = float(settings.fdc_finalization_lag_seconds)
+        self.latency = StageLatency()
+        # Whether this process may still sign; main.py points it at the
+        # ingest lease so a worker whose lease has run out never pays twice.
+        self.may_sign: Callable[[], bool] = lambda: True
 
     async def connect(self) -> None:
         self._w3 = AsyncWeb3(AsyncHTTPProvider(settings.flare_rpc_url))
@@ -147,6 +306,7 @@ class FDCClient:
             raise ValueError("PRIVATE_KEY is required for FDC mode")
 
         self._account = self._w3.eth.account.from_key(settings.private_key)
+        self._nonces = NonceManager(self._w3, self._account.address)
         log.info("Wallet: %s", self._account.address)
 
         # FdcHub contract
@@ -161,21 +321,30 @@ class FDCClient:
             abi=REGISTRY_ABI,
         )
 
-        fee_addr = await registry.functions.getContractAddressByName(
-            "FdcRequestFeeConfigurations"
-        ).call()
+        fee_addr, relay_addr, sm_addr = await asyncio.gather(
+            registry.functions.getContractAddressByName("FdcRequestFeeConfigurations").call(),
+            registry.functions.getContractAddressByName("Relay").call(),
+            registry.functions.getContractAddressByName("FlareSystemsManager").call(),
+        )
         self._fdc_fee = self._w3.eth.contract(address=fee_addr, abi=FDC_FEE_ABI)
-
-        relay_addr = await registry.functions.getContractAddressByName("Relay").call()
         self._relay = self._w3.eth.contract(address=relay_addr, abi=RELAY_ABI)
-
-        sm_addr = await registry.functions.getContractAddressByName(
-            "FlareSystemsManager"
-        ).call()
         self._systems_manager = self._w3.eth.contract(
             address=sm_addr, abi=SYSTEMS_MANAGER_ABI
         )
 
+        # These never change, so every later submission derives the voting
+        # round locally instead of re-reading them.
+        self._chain_id, self._first_round_ts, self._epoch_seconds, _ = await asyncio.gather(
+            self._w3.eth.chain_id,
+            self._systems_manager.functions.firstVotingRoundStartTs().call(),
+            self._systems_manager.functions.votingEpochDurationSeconds().call(),
+            self._nonces.prime(),
+        )
+        log.info(
+            "Chain %d: voting rounds start %d, every %ds",
+            self._chain_id, self._first_round_ts, self._epoch_seconds,
+        )
+
         log.info("FDC contracts resolved (FdcHub, Relay, FlareSystemsManager, FeeConfig)")
 
     # ------------------------------------------------------------------
@@ -198,19 +367,18 @@ class FDCClient:
             },
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                json=payload,
-                headers={
-                    "X-API-KEY": settings.verifier_api_key,
-                    "Content-Type": "application/json",
-                },
-            ) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    raise RuntimeError(f"Verifier error {resp.status}: {text}")
-                data = await resp.json()
+        async with http_client.post(
+            url,
+            json=payload,
+            headers={
+                "X-API-KEY": settings.verifier_api_key,
+                "Content-Type": "application/json",
+            },
+        ) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise RuntimeError(f"Verifier error {resp.status}: {text}")
+            data = await resp.json()
 
         status = data.get("status", "")
         if status != "VALID":
@@ -223,168 +391,267 @@ class FDCClient:
     # ------------------------------------------------------------------
     # Step 2: Submit on-chain to FdcHub
     # ------------------------------------------------------------------
-    async def submit_request(self, abi_encoded_request: str) -> tuple[int, int]:
+    async def sign_request(self, abi_encoded_request: str) -> tuple[int, str, str]:
+        """Build and sign the requestAttestation tx. Returns (nonce, tx_hash, raw_tx)."""
         request_bytes = bytes.fromhex(abi_encoded_request[2:])
 
-        # Get the attestation fee
-        fee = await self._fdc_fee.functions.getRequestFee(request_bytes).call()
+        # Fee and gas price in one concurrent round-trip; nonce, chain id and
+        # calldata are all local.
+        fee, gas_price = await asyncio.gather(
+            self._fdc_fee.functions.getRequestFee(request_bytes).call(),
+            self._w3.eth.gas_price,
+        )
         log.info("Attestation fee: %d wei", fee)
 
-        # Build and send transaction
-        tx = await self._fdc_hub.functions.requestAttestation(
-            request_bytes
-        ).build_transaction(
-            {
-                "from": self._account.address,
-                "value": fee,
-                "nonce": await self._w3.eth.get_transaction_count(self._account.address),
-                "gas": 500_000,
-                "maxFeePerGas": await self._w3.eth.gas_price * 2,
-                "maxPriorityFeePerGas": await self._w3.eth.gas_price,
-            }
-        )
+        # Checked after the last network round-trip; from here to the
+        # signature everything is local.
+        if not self.may_sign():
+            raise RuntimeError("Ingest lease not held; refusing to sign")
+        nonce = await self._nonces.next()
+        tx = {
+            "type": 2,
+            "chainId": self._chain_id,
+            "from": self._account.address,
+            "to": self._fdc_hub.address,
+            "data": self._fdc_hub.encode_abi("requestAttestation", args=[request_bytes]),
+            "value": fee,
+            "nonce": nonce,
+            "gas": 500_000,
+            "maxFeePerGas": gas_price * 2,
+            "maxPriorityFeePerGas": gas_price,
+        }
 
         signed = self._account.sign_transaction(tx)
-        tx_hash = await self._w3.eth.send_raw_transaction(signed.raw_transaction)
-        receipt = await self._w3.eth.wait_for_transaction_receipt(tx_hash)
-        log.info("Attestation submitted: tx=%s block=%d", tx_hash.hex(), receipt.blockNumber)
-
-        # Calculate voting round ID
+        return nonce, self._w3.to_hex(signed.hash), self._w3.to_hex(signed.raw_transaction)
+
+    async def submit_request(
+        self, tx_hash: str, raw_tx: str, resumed: bool = False
+    ) -> tuple[int, int]:
+        """Broadcast a signed request (idempotent) and return (round_id, block_ts).
+
+        `resumed` marks a tx persisted by an earlier run, which may have
+        broadcast it — and had it mined — before crashing.
+        """
+        # A mined tx cannot be resent ("nonce too low"), so look for its
+        # receipt first rather than failing a job whose fee is already paid.
+        receipt = await self._find_receipt(tx_hash) if resumed else None
+        if receipt is None:
+            try:
+                await self._w3.eth.send_raw_transaction(raw_tx)
+            except Exception as e:
+                # Resending a tx the node already has is expected when resuming
+                # a job; any other error is fatal unless it was mined meanwhile.
+                if "already known" not in str(e).lower():
+                    receipt = await self._find_receipt(tx_hash)
+                    if receipt is None:
+                        self._nonces.reset()
+                        raise
+        if receipt is None:
+            receipt = await self._w3.eth.wait_for_transaction_receipt(tx_hash)
+        log.info("Attestation submitted: tx=%s block=%d", tx_hash, receipt.blockNumber)
+
+        # The round comes from the block's own timestamp: the local clock can
+        # be off by enough to land a block just past a boundary in the
+        # previous round, and proof retrieval would then poll the wrong one.
         block = await self._w3.eth.get_block(receipt.blockNumber)
-        first_ts = await self._systems_manager.functions.firstVotingRoundStartTs().call()
-        epoch_dur = await self._systems_manager.functions.votingEpochDurationSeconds().call()
-        round_id = (block.timestamp - first_ts) // epoch_dur
+        block_ts = block.timestamp
+        round_id = self.voting_round_at(block_ts)
 
         log.info("Voting round ID: %d", round_id)
-        return round_id, block.timestamp
+        return round_id, block_ts
+
+    async def _find_receipt(self, tx_hash: str):
+        try:
+            return await self._w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def voting_round_at(self, ts: int) -> int:
+        return (ts - self._first_round_ts) // self._epoch_seconds
 
     # ------------------------------------------------------------------
     # Step 3: Wait for voting round finalization
     # ------------------------------------------------------------------
     async def wait_for_finalization(self, round_id: int, timeout: int = 300) -> None:
-        log.info("Waiting for round %d to finalize (up to %ds)...", round_id, timeout)
+        # A round cannot finalize before it ends, so sleep until shortly before
+        # the expected finalization time, then poll about once per block.
+        round_end = self._first_round_ts + (round_id + 1) * self._epoch_seconds
+        expected = round_end + self._finalization_lag
+        log.info(
+            "Waiting for round %d to finalize (expected in %.0fs, up to %ds)...",
+            round_id, max(0.0, expected - time.time()), timeout,
+        )
         deadline = time.time() + timeout
+        idle = expected - FINALIZATION_LEAD_S - time.time()
+        if idle > 0:
+            await asyncio.sleep(min(idle, timeout))
+        first_check = True
         while time.time() < deadline:
             is_final = await self._relay.functions.isFinalized(200, round_id).call()
             if is_final:
-                log.info("Round %d finalized!", round_id)
+                observed = time.time() - round_end
+                if first_check:
+                    # Already final when we looked: probe earlier next time.
+                    self._finalization_lag = max(0.0, self._finalization_lag - FINALIZATION_LEAD_S / 2)
+                else:
+                    self._finalization_lag = 0.8 * self._finalization_lag + 0.2 * observed
+                log.info("Round %d finalized! (%.0fs after round end)", round_id, observed)
                 return
-            await asyncio.sleep(10)
+            first_check = False
+            await asyncio.sleep(FINALIZATION_POLL_S)
         raise TimeoutError(f"Round {round_id} did not finalize within {timeout}s")
 
     # ------------------------------------------------------------------
     # Step 4: Retrieve proof from DA layer
     # ------------------------------------------------------------------
-    async def retrieve_proof(self, abi_encoded_request: str, round_id: int) -> dict:
+    async def retrieve_proof(self, abi_encoded_request: str, round_id: int, timeout: int = 300) -> dict:
         url = f"{settings.da_layer_url}api/v1/fdc/proof-by-request-round-raw"
         payload = {
             "votingRoundId": round_id,
             "requestBytes": abi_encoded_request,
         }
 
-        # DA layer needs time after finalization to build the merkle tree
-        log.info("Waiting 30s for DA layer to process proof...")
-        await asyncio.sleep(30)
-
-        for attempt in range(20):
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                ) as resp:
-                    body = await resp.text()
-                    if resp.status != 200:
-                        log.warning("DA layer returned %d (attempt %d): %s", resp.status, attempt + 1, body[:300])
-                        await asyncio.sleep(15)
-                        continue
-                    proof = await resp.json()
+        # The DA layer usually has the proof within seconds of finalization,
+        # so poll straight away and back off while it is still building.
+        deadline = time.time() + timeout
+        delay = DA_POLL_INITIAL_S
+        attempt = 0
+        while True:
+            attempt += 1
+            async with http_client.post(
+                url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+            ) as resp:
+                body = await resp.text()
+                if resp.status != 200:
+                    log.warning("DA layer returned %d (attempt %d): %s", resp.status, attempt, body[:300])
+                else:
+                    proof = json.loads(body)
                     if proof.get("response_hex"):
-                        log.info("Proof retrieved from DA layer!")
+                        log.info("Proof retrieved from DA layer! (attempt %d)", attempt)
                         return proof
-                    log.info("Proof not ready yet (attempt %d): %s", attempt + 1, str(proof)[:200])
-                    await asyncio.sleep(15)
+                    log.info("Proof not ready yet (attempt %d): %s", attempt, str(proof)[:200])
+            if time.time() + delay > deadline:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * DA_POLL_BACKOFF, DA_POLL_MAX_S)
 
-        raise RuntimeError("Failed to retrieve proof from DA layer after retries")
+        raise RuntimeError(f"Failed to retrieve proof from DA layer after {attempt} attempts")
 
     # ------------------------------------------------------------------
     # Step 5: Decode gas price data from attested response
     # ------------------------------------------------------------------
     def decode_gas_data(self, proof: dict) -> dict:
-        response_hex = proof["response_hex"]
-        raw = bytes.fromhex(response_hex[2:] if response_hex.startswith("0x") else response_hex)
-
-        # Decode outer IWeb2Json.Response struct.
-        # eth_abi doesn't handle nested tuples with trailing commas well,
-        # so we parse the raw response manually using offset-based decoding.
-        # The responseBody is the last field — a (bytes) tuple containing
-        # the ABI-encoded gas data.
-
-        # The response_hex from the DA layer raw endpoint wraps everything
-        # in an outer tuple with an offset pointer. Skip the first 32-byte
-        # offset word, then locate the responseBody bytes.
-        # Strategy: find the inner gas data by scanning for our 4-field struct.
-        # The responseBody.abiEncodedData starts after all the string fields.
-
-        # Simpler approach: use the decoded /api/v1/fdc endpoint which gives
-        # us the response_hex of just the full IWeb2Json.Response. The inner
-        # ABI-encoded data is at the end. We scan backwards for it.
-
-        # Most reliable: decode just the inner gas data.
-        # The response_hex contains the full struct. The last dynamic field
-        # is responseBody which is (bytes). We need to find where that bytes
-        # payload starts. We'll look for 4 consecutive uint256 values (128 bytes)
-        # near the end of the response.
-
-        # Actually, the simplest working approach: the gas data is 4 uint256s
-        # = exactly 128 bytes. Try decoding the last 128 bytes.
-        if len(raw) >= 128:
-            # Try progressively from the end to find valid gas data
-            for offset in range(len(raw) - 128, max(0, len(raw) - 512), -32):
-                try:
-                    gas_tuple = abi_decode(
-                        ["(uint256,uint256,uint256,uint256)"],
-                        raw[offset:offset + 128],
-                    )
-                    gas = gas_tuple[0]
-                    # Sanity check: gas prices should be reasonable (1 wei to 1 ETH in wei)
-                    if all(0 < g < 1_000_000_000_000 for g in gas):
-                        result = {
-                            "rapid_gas_price": gas[0] / 1e9,
-                            "fast_gas_price": gas[1] / 1e9,
-                            "propose_gas_price": gas[2] / 1e9,
-                            "safe_gas_price": gas[3] / 1e9,
-                        }
-                        log.info(
-                            "Decoded gas: rapid=%.4f fast=%.4f standard=%.4f slow=%.4f gwei",
-                            result["rapid_gas_price"],
-                            result["fast_gas_price"],
-                            result["propose_gas_price"],
-                            result["safe_gas_price"],
-                        )
-                        return result
-                except Exception:
-                    continue
-
-        raise RuntimeError("Could not decode gas data from proof response")
+        result = decode_web2json_response(proof["response_hex"])
+        log.info(
+            "Decoded gas: rapid=%.4f fast=%.4f standard=%.4f slow=%.4f gwei (url=%s ts=%d)",
+            result["rapid_gas_price"],
+            result["fast_gas_price"],
+            result["propose_gas_price"],
+            result["safe_gas_price"],
+            result["url"],
+            result["timestamp"],
+        )
+        return result
 
     # ------------------------------------------------------------------
-    # Full cycle: prepare → submit → wait → retrieve → decode
+    # Attestation jobs: prepare → submit → wait → retrieve → decode,
+    # with every state transition persisted.
     # ------------------------------------------------------------------
-    async def fetch_gas_price(self) -> dict | None:
+    async def start_attestation(self) -> int:
+        """Prepare a request with the verifier and persist it as a new job."""
+        if self._w3 is None:
+            await self.connect()
+        started = time.time()
+        abi_encoded_request = await self.prepare_request()
+        self.latency.record("prepare", time.time() - started)
+        job_id = await db.create_attestation(abi_encoded_request)
+        log.info("Attestation job %d prepared", job_id)
+        return job_id
+
+    async def resume_pending(self) -> list[int]:
+        """Return the ids of unfinished jobs that can be resumed after a restart.
+
+        Jobs that were prepared but never signed are failed instead: the
+        verifier's response hash is stale by now, so they would not prove.
+        """
+        if self._w3 is None:
+            await self.connect()
+        resumable = []
+        for job in await db.get_open_attestations():
+            if job["state"] == "prepared" and not job["raw_tx"]:
+                await db.update_attestation(
+                    job["id"], state="failed", error="abandoned before submission"
+                )
+            else:
+                resumable.append(job["id"])
+        if resumable:
+            log.info("Resuming %d attestation job(s): %s", len(resumable), resumable)
+        return resumable
+
+    async def run_attestation(
+        self,
+        job_id: int,
+        on_decoded: Callable[[dict], Awaitable[None]] | None = None,
+    ) -> dict | None:
+        """Drive a job from its persisted state to decoded (or failed).
+
+        `on_decoded` is awaited with the decoded gas data before the job is
+        marked decoded, so a crash in between re-delivers rather than drops it.
+        """
+        job = await db.get_attestation(job_id)
         try:
-            if self._w3 is None:
-                await self.connect()
+            while job["state"] in db.ATTESTATION_OPEN_STATES:
+                await self._advance(job, on_decoded)
+                job = await db.get_attestation(job_id)
+            return json.loads(job["result"]) if job["state"] == "decoded" else None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error("Attestation job %d failed in state %s: %s", job_id, job["state"], e, exc_info=True)
+            await db.update_attestation(job_id, state="failed", error=str(e)[:500])
+            return None
 
-            abi_encoded_request = await self.prepare_request()
-            round_id, block_ts = await self.submit_request(abi_encoded_request)
-            await self.wait_for_finalization(round_id)
-            proof = await self.retrieve_proof(abi_encoded_request, round_id)
-            return self.decode_gas_data(proof)
+    async def _advance(self, job: dict, on_decoded: Callable[[dict], Awaitable[None]] | None) -> None:
+        job_id, state = job["id"], job["state"]
+        started = time.time()
+        if state == "prepared":
+            tx_hash, raw_tx = job["tx_hash"], job["raw_tx"]
+            resumed = raw_tx is not None
+            if raw_tx is None:
+                nonce, tx_hash, raw_tx = await self.sign_request(job["abi_encoded_request"])
+                # Persist before broadcasting so a restart resends the same tx
+                # instead of paying for a second one.
+                await db.update_attestation(job_id, nonce=nonce, tx_hash=tx_hash, raw_tx=raw_tx)
+            round_id, block_ts = await self.submit_request(tx_hash, raw_tx, resumed)
+            self.latency.record("submit", time.time() - started)
+            await db.update_attestation(job_id, state="submitted", round_id=round_id, block_ts=block_ts)
+        elif state == "submitted":
+            await self.wait_for_finalization(job["round_id"])
+            self.latency.record("finalize", time.time() - started)
+            await db.update_attestation(job_id, state="finalized")
+        elif state == "finalized":
+            proof = await self.retrieve_proof(job["abi_encoded_request"], job["round_id"])
+            self.latency.record("proof", time.time() - started)
+            await db.update_attestation(job_id, state="proved", proof=json.dumps(proof))
+        elif state == "proved":
+            result = self.decode_gas_data(json.loads(job["proof"]))
+            if on_decoded is not None:
+                await on_decoded(result)
+            await db.update_attestation(job_id, state="decoded", result=json.dumps(result))
+            total = time.time() - job["created_at"]
+            self.latency.record("end_to_end", total)
+            log.info("Attestation job %d decoded (round %d, %.0fs end to end)", job_id, job["round_id"], total)
 
+    async def fetch_gas_price(self) -> dict | None:
+        """Run a single attestation job start to finish."""
+        try:
+            job_id = await self.start_attestation()
         except Exception as e:
             log.error("FDC fetch failed: %s", e, exc_info=True)
             return None
+        return await self.run_attestation(job_id)
 
 
 # Singleton
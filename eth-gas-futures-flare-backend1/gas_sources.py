@@ -0,0 +1,276 @@
+"""
+Direct (unattested) gas price sources.
+
+Several public sources are queried concurrently and the reading is the
+per-tier median of the first `gas_source_quorum` answers:
+
+  * The quorum is started at once, fastest sources first.
+  * If no answer arrives within the pool's recent latency percentile
+    (`gas_hedge_percentile`), one more source is started — a hedged
+    request — and again after each further delay. A failed source is
+    replaced straight away.
+  * Each source has a circuit breaker: after `gas_breaker_failures`
+    consecutive failures it is skipped for `gas_breaker_cooldown_seconds`,
+    then a single trial request decides whether it is closed again.
+
+Source URLs come from settings, so the layer can be pointed at local
+stand-in servers.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+
+import aiohttp
+
+from config import settings
+from db import TIERS
+from http_client import http_client
+
+log = logging.getLogger("flarerisk.gas_sources")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, max_failures: int, cooldown: float) -> None:
+        self.name = name
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """The trial request was abandoned without an outcome."""
+        self._trial = False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            if self.opened_at is None:
+                log.warning("%s: circuit opened after %d failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+
+
+class GasSource:
+    """One upstream. Subclasses build the request and parse the body into
+    gwei prices keyed by tier (missing tiers are left out)."""
+
+    name = ""
+
+    def __init__(self) -> None:
+        self.breaker = CircuitBreaker(
+            self.name, settings.gas_breaker_failures, settings.gas_breaker_cooldown_seconds
+        )
+        self.latencies: deque[float] = deque(maxlen=64)
+        self.successes = 0
+        self.errors = 0
+
+    def p50(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0.0
+
+    async def fetch(self) -> dict:
+        raise NotImplementedError
+
+    async def _get_json(self, url: str, **kwargs) -> dict:
+        timeout = aiohttp.ClientTimeout(total=settings.gas_source_timeout_seconds)
+        async with http_client.get(url, timeout=timeout, **kwargs) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "successes": self.successes,
+            "errors": self.errors,
+            "consecutive_failures": self.breaker.failures,
+            "p50_ms": round(self.p50() * 1000, 1),
+        }
+
+
+class BeaconchainSource(GasSource):
+    name = "beaconcha.in"
+
+    async def fetch(self) -> dict:
+        data = (await self._get_json(settings.beaconchain_gas_url))["data"]
+        return {tier: data[tier] / 1e9 for tier in TIERS}
+
+
+class EtherscanSource(GasSource):
+    name = "etherscan"
+
+    async def fetch(self) -> dict:
+        params = {
+            "chainid": 1,
+            "module": "gastracker",
+            "action": "gasoracle",
+            "apikey": settings.etherscan_api_key,
+        }
+        result = (await self._get_json(settings.gas_api_url, params=params))["result"]
+        if not isinstance(result, dict):
+            raise ValueError(f"Etherscan error: {result}")
+        return {
+            "fast": float(result["FastGasPrice"]),
+            "standard": float(result["ProposeGasPrice"]),
+            "slow": float(result["SafeGasPrice"]),
+        }
+
+
+class EthRpcSource(GasSource):
+    name = "eth-rpc"
+
+    async def fetch(self) -> dict:
+        timeout = aiohttp.ClientTimeout(total=settings.gas_source_timeout_seconds)
+        body = {"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []}
+        async with http_client.post(settings.eth_rpc_url, json=body, timeout=timeout) as resp:
+            resp.raise_for_status()
+            result = (await resp.json(content_type=None))["result"]
+        return {"standard": int(result, 16) / 1e9}
+
+
+SOURCE_TYPES = {cls.name: cls for cls in (BeaconchainSource, EtherscanSource, EthRpcSource)}
+
+
+class GasSourcePool:
+    def __init__(self, sources: list[GasSource], quorum: int) -> None:
+        self.sources = sources
+        self.quorum = quorum
+        # Recent successful response times across all sources, for hedging.
+        self._latencies: deque[float] = deque(maxlen=256)
+        self.hedged = 0
+
+    @classmethod
+    def from_settings(cls) -> "GasSourcePool":
+        sources = []
+        for name in settings.gas_sources:
+            if name == "etherscan" and not settings.etherscan_api_key:
+                log.info("Etherscan gas source disabled: no ETHERSCAN_API_KEY")
+                continue
+            sources.append(SOURCE_TYPES[name]())
+        return cls(sources, settings.gas_source_quorum)
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < 8:
+            return settings.gas_hedge_default_delay_seconds
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(settings.gas_hedge_percentile * len(ordered)))]
+
+    async def _call(self, source: GasSource) -> tuple[GasSource, dict | None]:
+        started = time.monotonic()
+        try:
+            tiers = await source.fetch()
+            if not tiers.get("standard"):
+                raise ValueError("no standard tier")
+        except asyncio.CancelledError:
+            # Overtaken by faster sources: a lower bound on its latency, so
+            # it sorts behind them next time.
+            source.latencies.append(time.monotonic() - started)
+            source.breaker.release()
+            raise
+        except Exception as e:
+            source.errors += 1
+            source.breaker.failure()
+            log.warning("Gas source %s failed: %s", source.name, e)
+            return source, None
+        elapsed = time.monotonic() - started
+        source.latencies.append(elapsed)
+        self._latencies.append(elapsed)
+        source.successes += 1
+        source.breaker.success()
+        return source, tiers
+
+    async def fetch(self) -> dict | None:
+        """Median reading across sources, or None if none answered.
+
+        Returns gwei prices keyed by tier plus `sources`, the names of the
+        sources that made up the median.
+        """
+        # Fastest first by median latency; sources with no history yet sort
+        # first so they get measured.
+        candidates = iter(
+            sorted((s for s in self.sources if s.breaker.state != "open"), key=GasSource.p50)
+        )
+        pending: set[asyncio.Task] = set()
+        launched: dict[asyncio.Task, GasSource] = {}
+
+        def launch() -> bool:
+            # allow() only once a source is really started: for a half-open
+            # breaker it takes the single trial slot.
+            for source in candidates:
+                if source.breaker.allow():
+                    task = asyncio.create_task(self._call(source))
+                    launched[task] = source
+                    pending.add(task)
+                    return True
+            return False
+
+        for _ in range(self.quorum):
+            launch()
+        answers: list[tuple[str, dict]] = []
+        deadline = time.monotonic() + settings.gas_fetch_deadline_seconds
+        try:
+            while pending and len(answers) < self.quorum:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=min(self.hedge_delay(), remaining),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if launch():
+                        self.hedged += 1
+                    continue
+                for task in done:
+                    source, tiers = task.result()
+                    if tiers is None:
+                        launch()
+                    else:
+                        answers.append((source.name, tiers))
+        finally:
+            for task in pending:
+                task.cancel()
+                # A task cancelled before it first ran never reaches _call's
+                # handler, so hand back a trial slot it may hold here.
+                launched[task].breaker.release()
+        if not answers:
+            return None
+        answers = answers[: self.quorum]
+        reading = {}
+        for tier in TIERS:
+            values = [tiers[tier] for _, tiers in answers if tiers.get(tier) is not None]
+            reading[tier] = statistics.median(values) if values else None
+        reading["sources"] = [name for name, _ in answers]
+        return reading
+
+    def stats(self) -> dict[str, dict]:
+        return {s.name: s.stats() for s in self.sources}
+
+
+# Singleton
+gas_sources = GasSourcePool.from_settings()
@@ -0,0 +1,167 @@
+"""
+In-memory hot window — the most recent N days of readings, held in RAM.
+
+The dashboard polls /gas/current, /gas/average and /health every few
+seconds. Those reads almost always target the recent past, so they are
+answered from parallel timestamp/price/source lists here instead of
+going through the single SQLite connection.
+
+The window is loaded from SQLite at startup and appended to on every
+insert. Anything older than `covered_from` is a miss and the caller
+falls back to SQLite.
+
+A running prefix sum of prices is kept alongside, so the average over
+any window is two bisects and a subtraction.
+"""
+
+import bisect
+import logging
+import time
+
+log = logging.getLogger("flarerisk.hot_window")
+
+
+class HotWindow:
+    def __init__(self, days: int, max_rows: int) -> None:
+        self.span = days * 86400
+        self.max_rows = max_rows
+        self.loaded = False
+        # Everything with timestamp >= covered_from is guaranteed to be here.
+        self.covered_from = 0
+        self.total_count = 0
+        self.hits = 0
+        self.misses = 0
+        self._ts: list[int] = []
+        self._price: list[float] = []
+        self._source: list[str] = []
+        # _cum[i] is the sum of every price appended before index i; _total
+        # is the sum of all of them. Values are absolute, so trimming the
+        # front never needs a rebase.
+        self._cum: list[float] = []
+        self._total = 0.0
+
+    # ------------------------------------------------------------------
+    # Population
+    # ------------------------------------------------------------------
+    def load(self, rows: list[tuple[int, float, str]], since_ts: int, total_count: int) -> None:
+        """Replace the window with `rows` (ordered by timestamp) covering [since_ts, now]."""
+        self._ts = [r[0] for r in rows]
+        self._price = [r[1] for r in rows]
+        self._source = [r[2] for r in rows]
+        self._cum = []
+        self._total = 0.0
+        for price in self._price:
+            self._cum.append(self._total)
+            self._total += price
+        self.covered_from = since_ts
+        self.total_count = total_count
+        self.loaded = True
+        self._trim()
+        log.info("Hot window loaded: %d readings since %d", len(self._ts), self.covered_from)
+
+    def append(self, timestamp: int, gas_price: float, source: str) -> None:
+        if not self.loaded:
+            return
+        self.total_count += 1
+        if timestamp < self.covered_from:
+            return
+        if not self._ts or timestamp >= self._ts[-1]:
+            self._ts.append(timestamp)
+            self._price.append(gas_price)
+            self._source.append(source)
+            self._cum.append(self._total)
+        else:
+            i = bisect.bisect_right(self._ts, timestamp)
+            self._ts.insert(i, timestamp)
+            self._price.insert(i, gas_price)
+            self._source.insert(i, source)
+            self._cum.insert(i, self._cum[i])
+            for j in range(i + 1, len(self._cum)):
+                self._cum[j] += gas_price
+        self._total += gas_price
+        self._trim()
+
+    def _trim(self) -> None:
+        cutoff = int(time.time()) - self.span
+        cut = 0
+        if cutoff > self.covered_from:
+            self.covered_from = cutoff
+            cut = bisect.bisect_left(self._ts, cutoff)
+        overflow = len(self._ts) - self.max_rows
+        if overflow > cut:
+            cut = overflow
+            self.covered_from = self._ts[cut - 1] + 1
+        if cut:
+            del self._ts[:cut]
+            del self._price[:cut]
+            del self._source[:cut]
+            del self._cum[:cut]
+
+    # ------------------------------------------------------------------
+    # Lookups — each returns None on a miss
+    # ------------------------------------------------------------------
+    def _covers(self, since_ts: int) -> bool:
+        if self.loaded and since_ts >= self.covered_from:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def latest(self) -> dict | None:
+        if not self._ts:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"timestamp": self._ts[-1], "gas_price": self._price[-1], "source": self._source[-1]}
+
+    def count(self) -> int | None:
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.total_count
+
+    def range(self, from_ts: int, to_ts: int | None = None) -> list[dict] | None:
+        if not self._covers(from_ts):
+            return None
+        lo = bisect.bisect_left(self._ts, from_ts)
+        hi = len(self._ts) if to_ts is None else bisect.bisect_right(self._ts, to_ts)
+        return [
+            {"timestamp": self._ts[i], "gas_price": self._price[i], "source": self._source[i]}
+            for i in range(lo, hi)
+        ]
+
+    def columns(
+        self, from_ts: int, to_ts: int
+    ) -> tuple[list[int], list[float], list[str]] | None:
+        """Like range(), as parallel timestamp/price/source list slices."""
+        if not self._covers(from_ts):
+            return None
+        lo = bisect.bisect_left(self._ts, from_ts)
+        hi = bisect.bisect_right(self._ts, to_ts)
+        return self._ts[lo:hi], self._price[lo:hi], self._source[lo:hi]
+
+    def average(self, from_ts: int, to_ts: int) -> dict | None:
+        if not self._covers(from_ts):
+            return None
+        lo = bisect.bisect_left(self._ts, from_ts)
+        hi = bisect.bisect_right(self._ts, to_ts)
+        if hi <= lo:
+            return {"avg_price": 0.0, "count": 0, "oldest": 0, "newest": 0}
+        hi_cum = self._cum[hi] if hi < len(self._cum) else self._total
+        return {
+            "avg_price": (hi_cum - self._cum[lo]) / (hi - lo),
+            "count": hi - lo,
+            "oldest": self._ts[lo],
+            "newest": self._ts[hi - 1],
+        }
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "rows": len(self._ts),
+            "covered_from": self.covered_from,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,97 @@
+"""
+Conditional GET for the /gas/* read endpoints.
+
+Responses are versioned by the database write revision (see
+db.data_version), which every worker on the same database shares, so an
+ETag can be computed — and an unchanged poll answered with 304 — before
+the request reaches an endpoint or SQLite.
+
+Endpoints whose window defaults to "now" use quantized_now(), which
+rounds up to `response_quantum_seconds`. Within one quantum the same URL
+maps to the same response, and the quantum is part of the ETag for those
+requests so the sliding window still advances.
+"""
+
+import time
+from email.utils import formatdate
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import db
+from config import settings
+
+# Endpoints that do not depend on the current time.
+_TIMELESS = {"/gas/current"}
+
+
+def quantized_now() -> int:
+    """Current unix time rounded up to the response quantum."""
+    q = settings.response_quantum_seconds
+    return -(-int(time.time()) // q) * q
+
+
+def current_etag(path: str, query: str) -> str:
+    revision, _ = db.data_version()
+    tag = f"{db.instance_id()}-{revision}"
+    if path not in _TIMELESS and "to" not in parse_qs(query):
+        tag += f"-{quantized_now()}"
+    return f'W/"{tag}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match.
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str = "/gas/", exclude: tuple[str, ...] = ()) -> None:
+        self.app = app
+        self.prefix = prefix
+        self.exclude = exclude
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not path.startswith(self.prefix)
+            or path in self.exclude
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        etag = current_etag(path, scope.get("query_string", b"").decode())
+        _, latest_ts = db.data_version()
+        cache_headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(latest_ts, usegmt=True),
+            "Cache-Control": f"public, max-age={settings.response_max_age_seconds}",
+        }
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in cache_headers.items()]
+                    + [(b"vary", b"Accept")],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_headers(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for key, value in cache_headers.items():
+                    headers[key] = value
+                # Chart endpoints negotiate JSON vs msgpack on Accept.
+                headers.add_vary_header("Accept")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,124 @@
+"""
+Shared outbound HTTP client.
+
+One aiohttp session for the whole process — verifier, DA layer and gas
+source calls all reuse its keep-alive connection pool and DNS cache
+instead of paying a fresh TCP+TLS handshake per request. Latency and
+connection reuse are tracked per upstream host.
+"""
+
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import settings
+
+log = logging.getLogger("flarerisk.http")
+
+
+class HostStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.latencies_ms: deque[float] = deque(maxlen=256)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        connections = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / connections, 4) if connections else 0.0,
+            "p50_ms": round(self.percentile(0.5), 1),
+            "p95_ms": round(self.percentile(0.95), 1),
+        }
+
+
+class HttpClient:
+    def __init__(self) -> None:
+        self._session: aiohttp.ClientSession | None = None
+        self._stats: dict[str, HostStats] = {}
+
+    def _host(self, host: str) -> HostStats:
+        if host not in self._stats:
+            self._stats[host] = HostStats()
+        return self._stats[host]
+
+    async def start(self) -> None:
+        if self._session is not None:
+            return
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_new_connection)
+        trace.on_connection_reuseconn.append(self._on_reused_connection)
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            ttl_dns_cache=settings.http_dns_cache_seconds,
+            keepalive_timeout=settings.http_keepalive_seconds,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.http_timeout_seconds),
+            trace_configs=[trace],
+        )
+        log.info("Shared HTTP client started")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _on_new_connection(self, session, ctx, params) -> None:
+        self._host(ctx.trace_request_ctx["host"]).new_connections += 1
+
+    async def _on_reused_connection(self, session, ctx, params) -> None:
+        self._host(ctx.trace_request_ctx["host"]).reused_connections += 1
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        """Issue a request on the shared session; yields the aiohttp response.
+
+        Starts the session lazily, so scripts that never run `lifespan`
+        still work.
+        """
+        if self._session is None:
+            await self.start()
+        host = urlsplit(url).netloc
+        stats = self._host(host)
+        stats.requests += 1
+        started = time.perf_counter()
+        try:
+            async with self._session.request(
+                method, url, trace_request_ctx={"host": host}, **kwargs
+            ) as resp:
+                stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+                yield resp
+        except Exception:
+            stats.errors += 1
+            raise
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict[str, dict]:
+        return {host: s.as_dict() for host, s in self._stats.items()}
+
+
+# Singleton
+http_client = HttpClient()
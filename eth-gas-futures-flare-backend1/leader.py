@@ -0,0 +1,141 @@
+"""
+Ingest leader election across worker processes.
+
+With `uvicorn --workers N` every process serves reads, but only the one
+holding the "ingest" lease samples gas prices, runs FDC attestations and
+does database upkeep. The lease is a row in the `leases` table with an
+expiry: the holder renews it every `lease_renew_seconds`, and any other
+worker takes it over once it has gone `lease_ttl_seconds` without a
+renewal — so a crashed leader is replaced within one TTL. A leader that
+cannot renew in time steps down on its own before its lease could pass to
+someone else, and a clean shutdown releases the lease at once. Role work
+checks holds_lease() before each side effect, so nothing is written or
+signed between the lease running out and the step-down.
+
+The lease uses its own connection, so a renewal never waits behind the
+shared writer's queue.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from collections.abc import Awaitable, Callable
+
+import aiosqlite
+
+from config import settings
+
+log = logging.getLogger("flarerisk.leader")
+
+
+class LeaderElector:
+    def __init__(
+        self,
+        name: str,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+    ) -> None:
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        # Local (monotonic) deadline by which the lease must be renewed.
+        self._valid_until = 0.0
+        self._conn: aiosqlite.Connection | None = None
+        self._task: asyncio.Task | None = None
+        # on_elected runs as its own task, so slow startup work (seeding,
+        # resuming jobs) never holds up renewals.
+        self._role: asyncio.Task | None = None
+        self.elections = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            await self._demote()
+            try:
+                await self._conn.execute(
+                    "UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?",
+                    (self.name, self.holder),
+                )
+                await self._conn.commit()
+                log.info("Released %s lease", self.name)
+            except Exception as e:
+                log.warning("Releasing %s lease failed: %s", self.name, e)
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _try_acquire(self) -> bool:
+        """Take or renew the lease. True if this process holds it."""
+        if self._conn is None:
+            self._conn = await aiosqlite.connect(
+                settings.db_path, timeout=settings.lease_renew_seconds
+            )
+        now = time.time()
+        cursor = await self._conn.execute(
+            """
+            INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE
+                SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            """,
+            (self.name, self.holder, now + settings.lease_ttl_seconds, now),
+        )
+        await self._conn.commit()
+        return cursor.rowcount == 1
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                held = await self._try_acquire()
+            except Exception as e:
+                log.warning("%s lease check failed: %s", self.name, e)
+                # Keep leading only while the last successful renewal lasts.
+                held = self.holds_lease()
+            else:
+                if held:
+                    # Measured from before the write, with one renewal period
+                    # of margin for clock skew between workers.
+                    self._valid_until = started + settings.lease_ttl_seconds - settings.lease_renew_seconds
+            if held and not self.is_leader:
+                self.is_leader = True
+                self.elections += 1
+                log.info("Acquired %s lease as %s", self.name, self.holder)
+                self._role = asyncio.create_task(self.on_elected())
+            elif not held and self.is_leader:
+                log.warning("Lost %s lease", self.name)
+                await self._demote()
+            await asyncio.sleep(settings.lease_renew_seconds)
+
+    async def _demote(self) -> None:
+        self.is_leader = False
+        if self._role is not None:
+            self._role.cancel()
+            await asyncio.gather(self._role, return_exceptions=True)
+            self._role = None
+        try:
+            await self.on_demoted()
+        except Exception as e:
+            log.error("Stepping down from %s failed: %s", self.name, e, exc_info=True)
+
+    def holds_lease(self) -> bool:
+        """True while this process leads and its last renewal is still valid.
+
+        is_leader only flips when the renewal loop next runs; role work
+        checks this before each side effect instead.
+        """
+        return self.is_leader and time.monotonic() < self._valid_until
+
+    def stats(self) -> dict:
+        return {"holder": self.holder, "is_leader": self.is_leader, "elections": self.elections}
@@ -6,28 +6,58 @@ and serves them through a REST API for the frontend.
 """
 
 import asyncio
+import json
 import logging
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Literal
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
+from archive import archive
+from broadcaster import Subscriber, broadcaster
 from config import settings
 from models import (
+    ArchiveStats,
     GasCurrentResponse,
     GasAverageResponse,
+    GasSourceStats,
+    GasTier,
+    GasCandle,
+    GasCandlesResponse,
+    GasDashboardResponse,
     GasHistoryResponse,
     GasReading,
+    GasTwapBatchRequest,
+    GasTwapBatchResponse,
+    GasTwapResponse,
     HealthResponse,
+    HotWindowStats,
+    LeaderStats,
+    QueryCacheStats,
+    ReadingSource,
+    RetentionStats,
+    ScheduledTaskStats,
+    StageLatencyStats,
+    StreamStats,
+    UpstreamStats,
 )
+import columnar
 import db
-import aiohttp
 
 from fdc import fdc_client
+from http_cache import ConditionalGetMiddleware, quantized_now
+from dashboard import AVERAGE_WINDOWS, dashboard
+from downsample import downsampler
+from gas_sources import gas_sources
+from http_client import http_client
+from leader import LeaderElector
 from mock import generate_gas_price, generate_historical
+from scheduler import scheduler
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -41,68 +71,145 @@ log = logging.getLogger("flarerisk")
 
 
 # ---------------------------------------------------------------------------
-# Direct gas price fetch (quick fallback while FDC cycle runs)
+# FDC attestation jobs (run concurrently, one started per poll tick)
 # ---------------------------------------------------------------------------
-async def _fetch_gas_direct() -> float | None:
-    """Fetch gas price directly from Beaconcha.in (unattested, for quick display)."""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://beaconcha.in/api/v1/execution/gasnow",
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as resp:
-                data = await resp.json()
-                return data["data"]["standard"] / 1e9
-    except Exception as e:
-        log.error("Direct gas fetch failed: %s", e)
-        return None
+_attestation_tasks: set[asyncio.Task] = set()
+
+
+async def _store_attested(result: dict) -> None:
+    gas_price = float(result["propose_gas_price"])
+    # Stamped with the attested data's own timestamp, so a re-delivery after
+    # a crash (or a resumed job) hits the same (timestamp, source) key.
+    await db.insert_reading(
+        result["timestamp"],
+        gas_price,
+        "fdc-attested",
+        durable=True,
+        rapid=float(result["rapid_gas_price"]),
+        fast=float(result["fast_gas_price"]),
+        slow=float(result["safe_gas_price"]),
+    )
+    log.info("FDC attested gas: %.4f gwei [flare-verified]", gas_price)
+
+
+def _spawn_attestation(job_id: int) -> None:
+    task = asyncio.create_task(fdc_client.run_attestation(job_id, _store_attested))
+    _attestation_tasks.add(task)
+    task.add_done_callback(_attestation_tasks.discard)
 
 
 # ---------------------------------------------------------------------------
-# Background poller
+# Background tasks — sampling, attestation and maintenance each run on
+# their own wall-clock cadence (see scheduler.py)
 # ---------------------------------------------------------------------------
-async def poll_loop() -> None:
+async def sample_gas() -> None:
+    if not ingest_leader.holds_lease():
+        log.warning("Ingest lease not held, skipping this sample")
+        return
+    if settings.use_mock:
+        gas_price = generate_gas_price()
+        await db.insert_reading(int(time.time()), gas_price, "mock")
+        log.info("Recorded gas: %.2f gwei [mock]", gas_price)
+        return
+    # Quick direct fetch so the dashboard has data between attestations
+    direct = await gas_sources.fetch()
+    if direct is None:
+        log.error("Direct gas fetch failed: no source answered")
+    else:
+        await db.insert_reading(
+            int(time.time()),
+            direct["standard"],
+            "direct",
+            rapid=direct["rapid"],
+            fast=direct["fast"],
+            slow=direct["slow"],
+        )
+        log.info(
+            "Recorded gas: %.4f gwei [direct/unattested, median of %s]",
+            direct["standard"],
+            ", ".join(direct["sources"]),
+        )
+
+
+async def start_attestation() -> None:
+    # A job takes ~3-5 min end to end and runs in the background alongside
+    # jobs from earlier rounds; this tick only kicks it off.
+    if not ingest_leader.holds_lease():
+        log.warning("Ingest lease not held, skipping this round")
+        return
+    if len(_attestation_tasks) >= settings.fdc_max_in_flight:
+        log.warning(
+            "%d attestation jobs already in flight, skipping this round",
+            len(_attestation_tasks),
+        )
+        return
+    log.info("Starting FDC Web2Json attestation job...")
+    _spawn_attestation(await fdc_client.start_attestation())
+
+
+async def start_background() -> None:
+    """Take on the ingest role: sampling, attestation and upkeep."""
     mode = "MOCK" if settings.use_mock else "FDC"
     log.info("Poller started — mode=%s, interval=%ds", mode, settings.poll_interval_seconds)
+    # Pick up anything the previous leader committed since our last sync.
+    await db.sync_writes()
 
     # Mock mode: seed 7 days of history on first run
     if settings.use_mock and await db.count_readings() == 0:
         log.info("Seeding 7 days of historical mock data...")
-        for r in generate_historical(hours=168):
-            await db.insert_reading(r["timestamp"], r["gas_price"], r["source"])
+        await db.insert_readings_bulk(generate_historical(hours=168))
         log.info("Seeding complete.")
 
-    while True:
+    scheduler.add(
+        "sample",
+        sample_gas,
+        settings.poll_interval_seconds,
+        timeout=settings.sample_timeout_seconds,
+    )
+    if not settings.use_mock:
+        # Pick up jobs left in flight by a previous run
         try:
-            if settings.use_mock:
-                # ── Mock mode ──
-                ts = int(time.time())
-                gas_price = generate_gas_price()
-                await db.insert_reading(ts, gas_price, "mock")
-                log.info("Recorded gas: %.2f gwei [mock]", gas_price)
-            else:
-                # ── FDC mode ──
-                # Quick direct fetch so dashboard has data immediately
-                direct_price = await _fetch_gas_direct()
-                if direct_price is not None:
-                    await db.insert_reading(int(time.time()), direct_price, "direct")
-                    log.info("Recorded gas: %.4f gwei [direct/unattested]", direct_price)
-
-                # Full FDC attestation cycle (~3-5 min)
-                log.info("Starting FDC Web2Json attestation cycle...")
-                result = await fdc_client.fetch_gas_price()
-                if result:
-                    ts = int(time.time())
-                    gas_price = float(result["propose_gas_price"])
-                    await db.insert_reading(ts, gas_price, "fdc-attested")
-                    log.info("FDC attested gas: %.4f gwei [flare-verified]", gas_price)
-                else:
-                    log.warning("FDC cycle returned no result")
-
+            for job_id in await fdc_client.resume_pending():
+                _spawn_attestation(job_id)
         except Exception as e:
-            log.error("Poll error: %s", e, exc_info=True)
+            log.error("Resuming attestation jobs failed: %s", e, exc_info=True)
+        scheduler.add(
+            "attest",
+            start_attestation,
+            settings.attest_interval_seconds,
+            jitter=settings.attest_jitter_seconds,
+            timeout=settings.attest_start_timeout_seconds,
+        )
+    scheduler.add(
+        "maintenance",
+        db.run_maintenance,
+        settings.maintenance_interval_seconds,
+        jitter=settings.maintenance_jitter_seconds,
+    )
+    scheduler.add("compaction", db.compact, settings.compaction_interval_seconds)
+    scheduler.start()
 
-        await asyncio.sleep(settings.poll_interval_seconds)
+
+async def stop_background() -> None:
+    await scheduler.stop()
+    # In-flight attestation jobs are persisted; the next leader resumes them.
+    for job in list(_attestation_tasks):
+        job.cancel()
+
+
+# Singleton
+ingest_leader = LeaderElector("ingest", start_background, stop_background)
+fdc_client.may_sign = ingest_leader.holds_lease
+
+
+async def follow_writes() -> None:
+    """Replay readings committed by other workers (see db.sync_writes)."""
+    while True:
+        await asyncio.sleep(settings.follower_poll_seconds)
+        try:
+            await db.sync_writes()
+        except Exception as e:
+            log.error("Write log sync failed: %s", e, exc_info=True)
 
 
 # ---------------------------------------------------------------------------
@@ -111,10 +218,18 @@ async def poll_loop() -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.get_db()
-    task = asyncio.create_task(poll_loop())
+    await db.load_hot_window()
+    await db.start_writer()
+    await http_client.start()
+    follower = asyncio.create_task(follow_writes())
+    ingest_leader.start()
     log.info("FlareRisk backend started on :%d", settings.port)
     yield
-    task.cancel()
+    await ingest_leader.stop()
+    follower.cancel()
+    broadcaster.close()
+    await http_client.close()
+    await db.stop_writer()
     await db.close_db()
 
 
@@ -131,6 +246,17 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Brotli (with gzip fallback) when brotli-asgi is installed, plain gzip
+# otherwise. Both leave text/event-stream untouched.
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+else:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, excluded_handlers=["/gas/stream"])
+
+app.add_middleware(ConditionalGetMiddleware, exclude=("/gas/stream",))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -152,17 +278,36 @@ async def health():
         mode="mock" if settings.use_mock else "fdc",
         readings_stored=count,
         latest_timestamp=latest["timestamp"] if latest else None,
+        hot_window=HotWindowStats(**db.hot_window.stats()),
+        query_cache=QueryCacheStats(**db.query_cache.stats()),
+        upstreams={
+            host: UpstreamStats(**stats) for host, stats in http_client.stats().items()
+        },
+        attestation_latency={
+            stage: StageLatencyStats(**stats)
+            for stage, stats in fdc_client.latency.stats().items()
+        },
+        stream=StreamStats(**broadcaster.stats()),
+        scheduler={name: ScheduledTaskStats(**st) for name, st in scheduler.stats().items()},
+        gas_sources={name: GasSourceStats(**st) for name, st in gas_sources.stats().items()},
+        ingest=LeaderStats(**ingest_leader.stats()),
+        retention=RetentionStats(**db.retention_stats()),
+        archive=ArchiveStats(**archive.stats()),
     )
 
 
 @app.get("/gas/current", response_model=GasCurrentResponse, tags=["Gas Data"])
-async def gas_current():
-    row = await db.get_latest()
+async def gas_current(
+    tier: GasTier = Query(default="standard", description="Gas price tier"),
+):
+    row = await db.get_latest(tier)
     if row is None:
         return GasCurrentResponse(
+            tier=tier,
             latest=GasReading(timestamp=0, gas_price_gwei=0.0, source="none"),
         )
     return GasCurrentResponse(
+        tier=tier,
         latest=GasReading(
             timestamp=row["timestamp"],
             gas_price_gwei=row["gas_price"],
@@ -171,13 +316,59 @@ async def gas_current():
     )
 
 
+@app.get("/gas/dashboard", response_model=GasDashboardResponse, tags=["Gas Data"])
+async def gas_dashboard(
+    averages: list[Literal["1d", "7d", "30d"]] = Query(
+        default=list(AVERAGE_WINDOWS), description="Average windows to include"
+    ),
+    since: int | None = Query(
+        default=None, description="Cursor from the previous response; only newer readings are sent"
+    ),
+):
+    snap = await dashboard.snapshot()
+    readings, truncated = dashboard.readings_since(snap, since)
+    if readings:
+        cursor = readings[-1].timestamp
+    elif since is not None:
+        cursor = since
+    else:
+        cursor = snap["latest"].timestamp if snap["latest"] else 0
+    return GasDashboardResponse(
+        generated_at=snap["generated_at"],
+        latest=snap["latest"],
+        averages={name: snap["averages"][name] for name in averages},
+        candles=snap["candles"],
+        readings=readings,
+        cursor=cursor,
+        truncated=truncated,
+    )
+
+
 @app.get("/gas/average", response_model=GasAverageResponse, tags=["Gas Data"])
-async def gas_average(days: int = Query(default=7, ge=1, le=30)):
-    since_ts = int(time.time()) - (days * 86400)
-    result = await db.get_average_since(since_ts)
+async def gas_average(
+    days: int = Query(default=7, ge=1, le=30),
+    from_ts: int | None = Query(
+        default=None, alias="from", description="Start unix timestamp (overrides days)"
+    ),
+    to_ts: int | None = Query(
+        default=None, alias="to", description="End unix timestamp (default: now)"
+    ),
+    tier: GasTier = Query(default="standard", description="Gas price tier"),
+):
+    now = quantized_now()
+    if to_ts is None:
+        to_ts = now
+    if from_ts is None:
+        from_ts = now - (days * 86400)
+    else:
+        days = None
+    result = await db.get_average(from_ts, to_ts, tier)
     return GasAverageResponse(
         average_gwei=round(result["avg_price"], 4),
+        tier=tier,
         days=days,
+        from_timestamp=from_ts,
+        to_timestamp=to_ts,
         sample_count=result["count"],
         oldest_timestamp=result["oldest"],
         newest_timestamp=result["newest"],
@@ -186,14 +377,64 @@ async def gas_average(days: int = Query(default=7, ge=1, le=30)):
 
 @app.get("/gas/history", response_model=GasHistoryResponse, tags=["Gas Data"])
 async def gas_history(
+    request: Request,
     from_ts: int = Query(alias="from", description="Start unix timestamp"),
     to_ts: int = Query(
         default=None, alias="to", description="End unix timestamp (default: now)"
     ),
+    tier: GasTier = Query(default="standard", description="Gas price tier"),
+    after: int | None = Query(
+        default=None, description="Keyset cursor: only readings with timestamp > after"
+    ),
+    limit: int | None = Query(
+        default=None, ge=1, le=10_000, description="Page size; the response carries next_after"
+    ),
+    format: Literal["json", "ndjson", "msgpack"] = Query(
+        default="json",
+        description="ndjson streams the range as it is read; msgpack is columnar",
+    ),
+    max_points: int | None = Query(
+        default=None, ge=10, le=20_000, description="Downsample to at most this many points"
+    ),
 ):
     if to_ts is None:
-        to_ts = int(time.time())
-    rows = await db.get_readings_range(from_ts, to_ts)
+        to_ts = quantized_now()
+    wants_msgpack = format == "msgpack" or columnar.accepts_msgpack(request.headers.get("accept"))
+    if max_points is not None:
+        ts, price, source = await downsampler.get(from_ts, to_ts, max_points, tier)
+        if wants_msgpack:
+            return _columnar_response(
+                {"timestamp": ("I", ts), "gas_price_gwei": ("d", price), "source": ("B", source)},
+                tier=tier,
+                sources=[db.SOURCE_NAMES[i] for i in range(len(db.SOURCE_NAMES))],
+                downsampled=True,
+            )
+        readings = [
+            GasReading(timestamp=t, gas_price_gwei=p, source=db.SOURCE_NAMES[s])
+            for t, p, s in zip(ts.tolist(), price.tolist(), source.tolist())
+        ]
+        return GasHistoryResponse(
+            tier=tier, readings=readings, count=len(readings), downsampled=True
+        )
+    if wants_msgpack:
+        ts, price, source = await db.get_reading_columns(from_ts, to_ts, tier, after)
+        return _columnar_response(
+            {"timestamp": ("I", ts), "gas_price_gwei": ("d", price), "source": ("B", source)},
+            tier=tier,
+            sources=[db.SOURCE_NAMES[i] for i in range(len(db.SOURCE_NAMES))],
+        )
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _ndjson_readings(db.iter_readings(from_ts, to_ts, tier, after)),
+            media_type="application/x-ndjson",
+        )
+    next_after = None
+    if limit is not None:
+        rows, next_after = await db.get_readings_page(from_ts, to_ts, limit, after, tier)
+    elif after is not None:
+        rows = await db.get_readings_range(max(from_ts, after + 1), to_ts, tier)
+    else:
+        rows = await db.get_readings_range(from_ts, to_ts, tier)
     readings = [
         GasReading(
             timestamp=r["timestamp"],
@@ -202,7 +443,182 @@ async def gas_history(
         )
         for r in rows
     ]
-    return GasHistoryResponse(readings=readings, count=len(readings))
+    return GasHistoryResponse(
+        tier=tier, readings=readings, count=len(readings), next_after=next_after
+    )
+
+
+def _columnar_response(columns: dict, **meta) -> Response:
+    return Response(columnar.pack(columns, **meta), media_type=columnar.MEDIA_TYPE)
+
+
+async def _ndjson_readings(batches):
+    async for batch in batches:
+        yield "".join(
+            json.dumps(
+                {"timestamp": r["timestamp"], "gas_price_gwei": r["gas_price"], "source": r["source"]},
+                separators=(",", ":"),
+            )
+            + "\n"
+            for r in batch
+        )
+
+
+@app.get("/gas/candles", response_model=GasCandlesResponse, tags=["Gas Data"])
+async def gas_candles(
+    request: Request,
+    interval: Literal["1m", "5m", "1h", "1d"] = Query(default="1h"),
+    from_ts: int = Query(alias="from", description="Start unix timestamp"),
+    to_ts: int = Query(
+        default=None, alias="to", description="End unix timestamp (default: now)"
+    ),
+    tier: GasTier = Query(default="standard", description="Gas price tier"),
+    format: Literal["json", "msgpack"] = Query(default="json", description="msgpack is columnar"),
+):
+    if to_ts is None:
+        to_ts = quantized_now()
+    if format == "msgpack" or columnar.accepts_msgpack(request.headers.get("accept")):
+        cols = await db.get_candle_columns(interval, from_ts, to_ts, tier)
+        return _columnar_response(
+            {name: ("I" if name in ("timestamp", "count") else "d", v) for name, v in cols.items()},
+            interval=interval,
+            tier=tier,
+        )
+    rows = await db.get_candles(interval, from_ts, to_ts, tier)
+    candles = [GasCandle(**r) for r in rows]
+    return GasCandlesResponse(interval=interval, tier=tier, candles=candles, count=len(candles))
+
+
+@app.get("/gas/twap", response_model=GasTwapResponse, tags=["Gas Data"])
+async def gas_twap(
+    from_ts: int = Query(alias="from", description="Start unix timestamp"),
+    to_ts: int = Query(
+        default=None, alias="to", description="End unix timestamp (default: now)"
+    ),
+    source: ReadingSource | None = Query(default=None, description="Restrict to one source"),
+    tier: GasTier = Query(default="standard", description="Gas price tier"),
+):
+    if to_ts is None:
+        to_ts = quantized_now()
+    if to_ts <= from_ts:
+        raise HTTPException(status_code=422, detail="'to' must be after 'from'")
+    result = await db.get_twap(from_ts, to_ts, source, tier)
+    return _twap_response(result, source, tier)
+
+
+@app.post("/gas/twap/batch", response_model=GasTwapBatchResponse, tags=["Gas Data"])
+async def gas_twap_batch(req: GasTwapBatchRequest):
+    windows = [(w.from_timestamp, w.to_timestamp) for w in req.windows]
+    results = await db.get_twaps(windows, req.source, req.tier)
+    return GasTwapBatchResponse(
+        results=[_twap_response(r, req.source, req.tier) for r in results],
+        count=len(results),
+    )
+
+
+def _twap_response(result: dict, source: str | None, tier: str) -> GasTwapResponse:
+    return GasTwapResponse(
+        twap_gwei=round(result["twap"], 6),
+        tier=tier,
+        source=source,
+        from_timestamp=result["from"],
+        to_timestamp=result["to"],
+        effective_from=result["effective_from"],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Live push: /gas/stream over WebSocket or Server-Sent Events
+# ---------------------------------------------------------------------------
+async def _reading_stream(
+    sub: Subscriber, since: int | None, delivered: tuple[int, str] | None = None
+):
+    """Replay readings from `since` on, then follow the broadcaster.
+
+    The replay includes `since` itself, so readings from other sources in
+    the same second are not lost; `delivered`, the (timestamp, source) of
+    the last event the client saw, is skipped. Yields reading events, or
+    None when nothing has arrived for `stream_heartbeat_seconds`. Ends
+    when the subscriber is evicted or the server shuts down. `sub` must
+    already be subscribed, so nothing committed during the replay is
+    missed; readings seen in both the replay and the live feed are sent
+    once.
+    """
+    replayed = set()
+    if since is not None:
+        # Only readings committed after subscribing can show up twice.
+        recent = int(time.time()) - 60
+        for event in await db.get_stream_backfill(since, settings.stream_resume_max_rows):
+            if (event["timestamp"], event["source"]) == delivered:
+                continue
+            if event["timestamp"] >= recent:
+                replayed.add((event["timestamp"], event["source"]))
+            yield event
+    while True:
+        try:
+            event = await asyncio.wait_for(sub.get(), settings.stream_heartbeat_seconds)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if event is None:
+            return
+        key = (event["timestamp"], event["source"])
+        if key in replayed:
+            replayed.discard(key)
+            continue
+        yield event
+
+
+@app.websocket("/gas/stream")
+async def gas_stream_ws(websocket: WebSocket, since: int | None = None):
+    await websocket.accept()
+    sub = broadcaster.subscribe()
+    try:
+        async for event in _reading_stream(sub, since):
+            if event is not None:
+                await websocket.send_json({"type": "reading", **event})
+        if sub.evicted:
+            await websocket.close(code=1013, reason="slow consumer")
+        else:
+            await websocket.close(code=1001)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+@app.get("/gas/stream", tags=["Gas Data"])
+async def gas_stream_sse(
+    since: int | None = Query(default=None, description="Replay readings from this unix timestamp on"),
+    last_event_id: str | None = Header(default=None),
+):
+    # Event ids are "<timestamp>:<source>"; a bare timestamp is accepted too.
+    delivered = None
+    if since is None and last_event_id:
+        ts, _, source = last_event_id.partition(":")
+        if ts.isdigit():
+            since = int(ts)
+            delivered = (since, source) if source else None
+
+    async def events():
+        sub = broadcaster.subscribe()
+        try:
+            async for event in _reading_stream(sub, since, delivered):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    event_id = f"{event['timestamp']}:{event['source']}"
+                    yield f"id: {event_id}\nevent: reading\ndata: {json.dumps(event)}\n\n"
+            if sub.evicted:
+                yield "event: evicted\ndata: {}\n\n"
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -224,4 +640,10 @@ async def serve_frontend():
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host=settings.host, port=settings.port, reload=True)
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        reload=True,
+        timeout_graceful_shutdown=5,
+    )
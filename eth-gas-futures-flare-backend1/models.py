@@ -1,27 +1,183 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+# Gas price tiers; "standard" is the headline price.
+GasTier = Literal["rapid", "fast", "standard", "slow"]
+
+# Sources a reading can come from; the keys of db.SOURCES.
+ReadingSource = Literal["mock", "direct", "fdc-attested"]
 
 
 class GasReading(BaseModel):
     timestamp: int
     gas_price_gwei: float
-    source: str  # "fdc-attested", "direct", or "mock"
+    source: str  # "fdc-attested", "direct", "mock", or "rollup" (compacted history)
 
 
 class GasCurrentResponse(BaseModel):
+    tier: GasTier = "standard"
     latest: GasReading
 
 
 class GasAverageResponse(BaseModel):
     average_gwei: float
-    days: int
+    tier: GasTier = "standard"
+    days: int | None  # None when an explicit from/to window was requested
+    from_timestamp: int
+    to_timestamp: int
     sample_count: int
     oldest_timestamp: int
     newest_timestamp: int
 
 
 class GasHistoryResponse(BaseModel):
+    tier: GasTier = "standard"
     readings: list[GasReading]
     count: int
+    next_after: int | None = None  # pass as `after` for the next page; None = last page
+    downsampled: bool = False  # True when max_points thinned the range
+
+
+class GasCandle(BaseModel):
+    timestamp: int  # bucket start
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int
+    mean: float
+
+
+class GasCandlesResponse(BaseModel):
+    interval: str
+    tier: GasTier = "standard"
+    candles: list[GasCandle]
+    count: int
+
+
+class GasTwapResponse(BaseModel):
+    twap_gwei: float
+    tier: GasTier = "standard"
+    source: str | None  # None = all sources
+    from_timestamp: int
+    to_timestamp: int
+    effective_from: int  # window start after clipping to the first reading
+
+
+class TwapWindow(BaseModel):
+    from_timestamp: int
+    to_timestamp: int
+
+    @model_validator(mode="after")
+    def _non_empty(self):
+        if self.to_timestamp <= self.from_timestamp:
+            raise ValueError("to_timestamp must be after from_timestamp")
+        return self
+
+
+class GasTwapBatchRequest(BaseModel):
+    windows: list[TwapWindow] = Field(max_length=1000)
+    source: ReadingSource | None = None
+    tier: GasTier = "standard"
+
+
+class GasTwapBatchResponse(BaseModel):
+    results: list[GasTwapResponse]
+    count: int
+
+
+class GasDashboardResponse(BaseModel):
+    generated_at: int  # `to` of the averages and candles
+    latest: GasReading | None
+    averages: dict[str, GasAverageResponse]  # keyed by window: "1d", "7d", "30d"
+    candles: list[GasCandle]  # hourly, last 24h
+    readings: list[GasReading]  # readings after `since`
+    cursor: int  # pass as `since` on the next poll
+    truncated: bool  # `since` was older than the recent window; backfill via /gas/history
+
+
+class HotWindowStats(BaseModel):
+    rows: int
+    covered_from: int
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class QueryCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    invalidated: int
+    hit_ratio: float
+
+
+class UpstreamStats(BaseModel):
+    requests: int
+    errors: int
+    new_connections: int
+    reused_connections: int
+    reuse_ratio: float
+    p50_ms: float
+    p95_ms: float
+
+
+class StageLatencyStats(BaseModel):
+    count: int
+    last_s: float
+    p50_s: float
+    p95_s: float
+
+
+class StreamStats(BaseModel):
+    subscribers: int
+    published: int
+    evicted: int
+
+
+class ScheduledTaskStats(BaseModel):
+    interval_s: float
+    started: int
+    failed: int
+    timed_out: int
+    skipped: int
+    running: int
+    last_lag_s: float  # how late the last run started after its tick
+    last_duration_s: float
+
+
+class GasSourceStats(BaseModel):
+    state: str  # circuit breaker: closed, open or half-open
+    successes: int
+    errors: int
+    consecutive_failures: int
+    p50_ms: float
+
+
+class LeaderStats(BaseModel):
+    holder: str  # this worker's lease holder id
+    is_leader: bool  # whether this worker runs ingest and attestation
+    elections: int
+
+
+class RetentionStats(BaseModel):
+    raw_from: int  # raw readings are kept from here on (0 = all)
+    rollup_5m_from: int  # 5-minute candles are kept from here on (0 = all)
+    archived_until: int  # earlier raw readings are read from the archive (0 = none)
+    readings_archived: int
+    readings_deleted: int
+    candles_deleted: int
+    twap_points_removed: int
+
+
+class ArchiveStats(BaseModel):
+    days: int  # sealed days, empty ones included
+    rows: int
+    covered_from: int
+    covered_until: int
+    bytes: int
 
 
 class HealthResponse(BaseModel):
@@ -29,3 +185,13 @@ class HealthResponse(BaseModel):
     mode: str
     readings_stored: int
     latest_timestamp: int | None
+    hot_window: HotWindowStats
+    query_cache: QueryCacheStats
+    upstreams: dict[str, UpstreamStats]  # keyed by host
+    attestation_latency: dict[str, StageLatencyStats]  # keyed by FDC stage
+    stream: StreamStats
+    scheduler: dict[str, ScheduledTaskStats]  # keyed by task name
+    gas_sources: dict[str, GasSourceStats]  # keyed by source name
+    ingest: LeaderStats
+    retention: RetentionStats
+    archive: ArchiveStats
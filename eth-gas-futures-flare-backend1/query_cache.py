@@ -0,0 +1,144 @@
+"""
+Result cache for aggregate and range queries.
+
+Wrapped functions are keyed by their normalised arguments. Each entry
+records the time window it was computed over, and a committed write drops
+exactly the entries whose window contains one of its timestamps; other
+entries survive until they age out (TTL) or are pushed out by the LRU
+entry and byte budgets.
+
+Identical concurrent misses are single-flighted: the query runs once, as
+its own task, and every caller awaits its result. Cancelling one caller
+does not cancel the query for the others.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+log = logging.getLogger("flarerisk.query_cache")
+
+
+def _sizeof(value) -> int:
+    """Rough in-memory size; lists are estimated from their first item."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)) and value:
+        size += _sizeof(value[0]) * len(value)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "lo", "hi")
+
+    def __init__(self, value, size: int, expires: float, lo: int, hi: int) -> None:
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.lo = lo
+        self.hi = hi
+
+
+class QueryCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self._bytes = 0
+        # Bumped by every invalidation; a result computed across a bump may
+        # predate the write and is returned but not stored.
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def cached(self, window: Callable[..., tuple[int, int]]):
+        """Decorate an async query. `window(*args, **kwargs)` returns the
+        (from_ts, to_ts) range of readings the result depends on."""
+
+        def decorate(fn):
+            sig = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (fn.__name__, *bound.arguments.values())
+                return await self._get(key, lambda: fn(*args, **kwargs), window(*args, **kwargs))
+
+            return wrapper
+
+        return decorate
+
+    async def _get(self, key: tuple, compute, window: tuple[int, int]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self._drop(key)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        # The query runs as its own task shared by every caller, so one
+        # caller being cancelled never cancels it for the others.
+        task = asyncio.create_task(self._compute(key, compute, window))
+        # Retrieved here so an exception nobody else awaited is not logged.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: tuple, compute, window: tuple[int, int]):
+        epoch = self._epoch
+        try:
+            value = await compute()
+        finally:
+            del self._inflight[key]
+        if epoch == self._epoch:
+            self._store(key, value, window)
+        return value
+
+    def _store(self, key: tuple, value, window: tuple[int, int]) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = _Entry(value, size, time.monotonic() + self.ttl, *window)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: tuple) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def invalidate(self, from_ts: int, to_ts: int) -> None:
+        """Drop every entry whose window overlaps [from_ts, to_ts]."""
+        self._epoch += 1
+        stale = [k for k, e in self._entries.items() if e.lo <= to_ts and from_ts <= e.hi]
+        for key in stale:
+            self._drop(key)
+        self.invalidated += len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
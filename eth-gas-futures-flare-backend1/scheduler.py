@@ -0,0 +1,139 @@
+"""
+Periodic task scheduler.
+
+Each task fires on absolute wall-clock ticks (multiples of its interval
+since the epoch, plus optional random jitter), so a slow run never pushes
+the next one back and the cadence does not drift. Runs are started as
+their own asyncio tasks with an optional timeout; what happens when a tick
+arrives while the previous run is still going is the task's overlap
+policy:
+
+    "skip"   — drop this tick (counted in stats)
+    "allow"  — start another run alongside it
+    "cancel" — cancel the old run and start a new one
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Literal
+
+log = logging.getLogger("flarerisk.scheduler")
+
+Overlap = Literal["skip", "allow", "cancel"]
+
+
+class PeriodicTask:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[None]],
+        interval: float,
+        jitter: float = 0.0,
+        timeout: float | None = None,
+        overlap: Overlap = "skip",
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.overlap = overlap
+        self._runs: set[asyncio.Task] = set()
+        self.started = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.skipped = 0
+        self.last_lag_s = 0.0
+        self.last_duration_s = 0.0
+
+    def next_tick(self, now: float) -> float:
+        return (now // self.interval + 1) * self.interval
+
+    def fire(self, tick: float) -> None:
+        if self._runs:
+            if self.overlap == "skip":
+                self.skipped += 1
+                log.warning("%s: previous run still going, skipping tick", self.name)
+                return
+            if self.overlap == "cancel":
+                for run in self._runs:
+                    run.cancel()
+        self.started += 1
+        self.last_lag_s = time.time() - tick
+        run = asyncio.create_task(self._run())
+        self._runs.add(run)
+        run.add_done_callback(self._runs.discard)
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self.fn(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            log.error("%s: timed out after %gs", self.name, self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            log.error("%s failed: %s", self.name, e, exc_info=True)
+        finally:
+            self.last_duration_s = time.monotonic() - started
+
+    def cancel_runs(self) -> None:
+        for run in self._runs:
+            run.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "interval_s": self.interval,
+            "started": self.started,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "skipped": self.skipped,
+            "running": len(self._runs),
+            "last_lag_s": round(self.last_lag_s, 3),
+            "last_duration_s": round(self.last_duration_s, 3),
+        }
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self._tasks: dict[str, PeriodicTask] = {}
+        self._loops: list[asyncio.Task] = []
+
+    def add(self, name: str, fn: Callable[[], Awaitable[None]], interval: float, **kwargs) -> None:
+        self._tasks[name] = PeriodicTask(name, fn, interval, **kwargs)
+
+    def start(self) -> None:
+        for task in self._tasks.values():
+            self._loops.append(asyncio.create_task(self._loop(task)))
+            log.info("Scheduled %s every %gs (overlap=%s)", task.name, task.interval, task.overlap)
+
+    async def stop(self) -> None:
+        for loop in self._loops:
+            loop.cancel()
+        for task in self._tasks.values():
+            task.cancel_runs()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops.clear()
+
+    async def _loop(self, task: PeriodicTask) -> None:
+        tick = 0.0
+        while True:
+            # max() guards against the sleep waking a hair early and the
+            # same tick being computed (and fired) twice.
+            tick = task.next_tick(max(time.time(), tick))
+            # Sleep to the absolute tick rather than for a fixed interval, so
+            # time spent inside runs never accumulates into drift.
+            await asyncio.sleep(max(0.0, tick + random.uniform(0, task.jitter) - time.time()))
+            task.fire(tick)
+
+    def stats(self) -> dict[str, dict]:
+        return {name: task.stats() for name, task in self._tasks.items()}
+
+
+# Singleton
+scheduler = Scheduler()
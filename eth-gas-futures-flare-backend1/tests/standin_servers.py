@@ -0,0 +1,86 @@
+"""
+Local stand-ins for the direct gas sources.
+
+One aiohttp server answers in each upstream's own format — beaconcha.in
+`/gasnow`, the Etherscan gas oracle and `eth_gasPrice` over JSON-RPC —
+with per-source latency, failures and prices that a test can change
+between fetches. `standin_sources()` points the source URL settings at
+it for the duration of a test.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from config import settings
+
+
+class StandIn:
+    def __init__(self, standard: float) -> None:
+        self.latency = 0.0
+        self.fail = False
+        self.calls = 0
+        # gwei by tier
+        self.prices = {
+            "rapid": standard * 1.5,
+            "fast": standard * 1.2,
+            "standard": standard,
+            "slow": standard * 0.8,
+        }
+
+    async def respond(self, body) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            return web.Response(status=503, text="injected failure")
+        return web.json_response(body)
+
+
+def _app(upstreams: dict[str, StandIn]) -> web.Application:
+    async def beaconchain(request: web.Request) -> web.Response:
+        up = upstreams["beaconcha.in"]
+        return await up.respond({"data": {t: int(p * 1e9) for t, p in up.prices.items()}})
+
+    async def etherscan(request: web.Request) -> web.Response:
+        up = upstreams["etherscan"]
+        return await up.respond({
+            "status": "1",
+            "result": {
+                "FastGasPrice": str(up.prices["fast"]),
+                "ProposeGasPrice": str(up.prices["standard"]),
+                "SafeGasPrice": str(up.prices["slow"]),
+            },
+        })
+
+    async def eth_rpc(request: web.Request) -> web.Response:
+        up = upstreams["eth-rpc"]
+        call = await request.json()
+        return await up.respond(
+            {"jsonrpc": "2.0", "id": call["id"], "result": hex(int(up.prices["standard"] * 1e9))}
+        )
+
+    app = web.Application()
+    app.router.add_get("/gasnow", beaconchain)
+    app.router.add_get("/etherscan", etherscan)
+    app.router.add_post("/rpc", eth_rpc)
+    return app
+
+
+@asynccontextmanager
+async def standin_sources(standard_prices: dict[str, float]):
+    """Serve stand-ins for beaconcha.in, etherscan and eth-rpc, given each
+    one's standard price. Yields the StandIn objects keyed by source name."""
+    upstreams = {name: StandIn(price) for name, price in standard_prices.items()}
+    server = TestServer(_app(upstreams))
+    await server.start_server()
+    saved = (settings.beaconchain_gas_url, settings.gas_api_url, settings.eth_rpc_url)
+    settings.beaconchain_gas_url = str(server.make_url("/gasnow"))
+    settings.gas_api_url = str(server.make_url("/etherscan"))
+    settings.eth_rpc_url = str(server.make_url("/rpc"))
+    try:
+        yield upstreams
+    finally:
+        settings.beaconchain_gas_url, settings.gas_api_url, settings.eth_rpc_url = saved
+        await server.close()
@@ -0,0 +1,63 @@
+"""decode_web2json_response against a synthetic IWeb2Json.Response.
+
+fixtures/synthetic_web2json_proof.json is not a recorded DA-layer reply.
+It has the shape of a proof-by-request-round-raw response for one of our
+gasnow requests, with response_hex encoded by eth_abi and an empty Merkle
+proof. It checks the decoder against the ABI layout as eth_abi produces
+it, not against a live response.
+"""
+
+import json
+import os
+
+import pytest
+
+from fdc import GAS_API_URL, FDCClient, decode_web2json_response
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "synthetic_web2json_proof.json")
+
+EXPECTED = {
+    "rapid_gas_price": 1.520354112,
+    "fast_gas_price": 1.26696176,
+    "propose_gas_price": 1.013569408,
+    "safe_gas_price": 0.875216512,
+    "url": GAS_API_URL,
+    "timestamp": 1_770_510_970,
+    "voting_round": 1_047_312,
+}
+
+
+def load_proof() -> dict:
+    with open(FIXTURE) as f:
+        return json.load(f)
+
+
+def check(result: dict) -> None:
+    for tier in ("rapid_gas_price", "fast_gas_price", "propose_gas_price", "safe_gas_price"):
+        assert result[tier] == pytest.approx(EXPECTED[tier])
+    assert result["url"] == EXPECTED["url"]
+    assert result["timestamp"] == EXPECTED["timestamp"]
+    assert result["voting_round"] == EXPECTED["voting_round"]
+
+
+def test_wrapped_response():
+    response_hex = load_proof()["response_hex"]
+    # The raw endpoint wraps the struct as one dynamic tuple.
+    assert int(response_hex[2:66], 16) == 0x20
+    check(decode_web2json_response(response_hex))
+
+
+def test_bare_response():
+    bare = bytes.fromhex(load_proof()["response_hex"][2:])[32:]
+    check(decode_web2json_response(bare))
+    check(decode_web2json_response(bare.hex()))
+
+
+def test_decode_gas_data_takes_the_stored_proof():
+    check(FDCClient().decode_gas_data(load_proof()))
+
+
+def test_truncated_response_is_rejected():
+    raw = bytes.fromhex(load_proof()["response_hex"][2:])
+    with pytest.raises(ValueError):
+        decode_web2json_response(raw[:200])
@@ -0,0 +1,150 @@
+"""Direct gas sources against local stand-in servers (see standin_servers.py)."""
+
+import asyncio
+import statistics
+import time
+
+import pytest
+
+from config import settings
+from gas_sources import BeaconchainSource, EtherscanSource, EthRpcSource, GasSourcePool
+from http_client import http_client
+from standin_servers import standin_sources
+
+PRICES = {"beaconcha.in": 20.0, "etherscan": 30.0, "eth-rpc": 50.0}
+
+
+@pytest.fixture(autouse=True)
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(settings, "gas_source_timeout_seconds", 2.0)
+    monkeypatch.setattr(settings, "gas_fetch_deadline_seconds", 3.0)
+    monkeypatch.setattr(settings, "gas_hedge_default_delay_seconds", 0.1)
+    monkeypatch.setattr(settings, "gas_breaker_failures", 2)
+    monkeypatch.setattr(settings, "gas_breaker_cooldown_seconds", 0.3)
+
+
+def run(test):
+    async def main():
+        try:
+            async with standin_sources(PRICES) as upstreams:
+                await test(upstreams)
+        finally:
+            await http_client.close()
+
+    asyncio.run(main())
+
+
+def make_pool(quorum: int) -> GasSourcePool:
+    sources = [BeaconchainSource(), EtherscanSource(), EthRpcSource()]
+    return GasSourcePool(sources, quorum)
+
+
+def test_quorum_median():
+    async def test(upstreams):
+        upstreams["eth-rpc"].latency = 0.5
+        reading = await make_pool(quorum=2).fetch()
+        assert sorted(reading["sources"]) == ["beaconcha.in", "etherscan"]
+        assert reading["standard"] == pytest.approx(statistics.median([20.0, 30.0]))
+        assert reading["fast"] == pytest.approx(statistics.median([24.0, 36.0]))
+        # Only beaconcha.in reports the rapid tier.
+        assert reading["rapid"] == pytest.approx(30.0)
+
+    run(test)
+
+
+def test_hedges_past_a_slow_source():
+    async def test(upstreams):
+        upstreams["beaconcha.in"].latency = 1.5
+        pool = make_pool(quorum=2)
+        started = time.monotonic()
+        reading = await pool.fetch()
+        assert time.monotonic() - started < 1.0
+        assert pool.hedged == 1
+        assert sorted(reading["sources"]) == ["eth-rpc", "etherscan"]
+        assert reading["standard"] == pytest.approx(40.0)
+
+    run(test)
+
+
+def test_failed_source_is_replaced():
+    async def test(upstreams):
+        upstreams["etherscan"].fail = True
+        reading = await make_pool(quorum=2).fetch()
+        assert sorted(reading["sources"]) == ["beaconcha.in", "eth-rpc"]
+        assert upstreams["etherscan"].calls == 1
+
+    run(test)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    async def test(upstreams):
+        pool = make_pool(quorum=1)
+        beacon = pool.sources[0]
+        upstreams["beaconcha.in"].fail = True
+        await pool.fetch()
+        await pool.fetch()
+        assert beacon.breaker.state == "open"
+        calls = upstreams["beaconcha.in"].calls
+        await pool.fetch()
+        assert upstreams["beaconcha.in"].calls == calls  # skipped while open
+
+        await asyncio.sleep(settings.gas_breaker_cooldown_seconds)
+        assert beacon.breaker.state == "half-open"
+        upstreams["beaconcha.in"].fail = False
+        reading = await pool.fetch()
+        assert upstreams["beaconcha.in"].calls == calls + 1
+        assert reading["sources"] == ["beaconcha.in"]
+        assert beacon.breaker.state == "closed"
+
+    run(test)
+
+
+def test_failed_trial_reopens_breaker():
+    async def test(upstreams):
+        pool = make_pool(quorum=1)
+        beacon = pool.sources[0]
+        upstreams["beaconcha.in"].fail = True
+        await pool.fetch()
+        await pool.fetch()
+        await asyncio.sleep(settings.gas_breaker_cooldown_seconds)
+        await pool.fetch()
+        assert beacon.breaker.state == "open"
+
+    run(test)
+
+
+def test_half_open_source_not_launched_keeps_its_trial():
+    async def test(upstreams):
+        pool = make_pool(quorum=1)
+        beacon = pool.sources[0]
+        upstreams["beaconcha.in"].fail = True
+        await pool.fetch()
+        await pool.fetch()
+        upstreams["beaconcha.in"].fail = False
+        # Slower than the others, so it sorts last once half-open.
+        beacon.latencies.extend([1.0] * 8)
+        await asyncio.sleep(settings.gas_breaker_cooldown_seconds)
+        calls = upstreams["beaconcha.in"].calls
+        for _ in range(5):
+            await pool.fetch()
+        assert upstreams["beaconcha.in"].calls == calls
+        assert beacon.breaker.state == "half-open"
+        assert beacon.breaker.allow()
+        beacon.breaker.release()
+
+        # Once it is needed, the trial goes ahead and closes the breaker.
+        upstreams["etherscan"].fail = upstreams["eth-rpc"].fail = True
+        reading = await pool.fetch()
+        assert reading["sources"] == ["beaconcha.in"]
+        assert beacon.breaker.state == "closed"
+
+    run(test)
+
+
+def test_all_sources_down():
+    async def test(upstreams):
+        for up in upstreams.values():
+            up.fail = True
+        assert await make_pool(quorum=2).fetch() is None
+
+    run(test)
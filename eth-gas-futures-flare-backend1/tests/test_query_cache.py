@@ -0,0 +1,65 @@
+"""Single-flighting in the query-result cache."""
+
+import asyncio
+
+import pytest
+
+from query_cache import QueryCache
+
+
+def make_query():
+    cache = QueryCache(max_entries=16, max_bytes=1 << 20, ttl_seconds=60)
+    calls = []
+
+    @cache.cached(window=lambda x: (x, x))
+    async def q(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x * 2
+
+    return cache, q, calls
+
+
+def test_concurrent_misses_run_one_query():
+    async def main():
+        cache, q, calls = make_query()
+        assert await asyncio.gather(q(1), q(1), q(1)) == [2, 2, 2]
+        assert calls == [1]
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    asyncio.run(main())
+
+
+def test_cancelling_the_first_caller_spares_the_others():
+    async def main():
+        cache, q, calls = make_query()
+        first = asyncio.create_task(q(1))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(q(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 2
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert calls == [1]
+        # The query finished and was stored even though its starter left.
+        assert await q(1) == 2
+        assert calls == [1]
+
+    asyncio.run(main())
+
+
+def test_failure_reaches_every_caller():
+    async def main():
+        cache = QueryCache(max_entries=16, max_bytes=1 << 20, ttl_seconds=60)
+
+        @cache.cached(window=lambda x: (x, x))
+        async def q(x):
+            await asyncio.sleep(0.01)
+            raise ValueError(x)
+
+        results = await asyncio.gather(q(1), q(1), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert not cache._inflight
+
+    asyncio.run(main())